@@ -1,64 +1,48 @@
 # -*- coding: utf-8 -*-
 
-import requests
-import io
-import zipfile
 import os
 
-from dwd_data_info import dwd_data_info
+from dwd_data_info import station_ids
+from dwd_download import download_all, print_total
+from dwd_catalog import station_archives, update_info
 
 ##################################
 # DEFINITIONS
 ##################################
 
 output_folder = "1_downloaded_data_files"
+archive_folder = os.path.join(output_folder, "archives")   # the zip archives are streamed to here
+max_workers = 8     # number of parallel downloads sharing one keep-alive connection pool
+offline = False     # if True, no request is made and only the cached archives are used
+max_retries = 5     # interrupted downloads are resumed up to this many times, with exponential backoff
 
-##################################
-# INITIALIZE DATA LISTS
-##################################
+# the archives of the station_ids set in dwd_data_info are resolved from this catalog
+catalog_path = os.path.join(output_folder, "catalog.json")
 
-urls = [dwd_data_info[ddi]["url"] for ddi in dwd_data_info]
-file_names = [dwd_data_info[ddi]["file_name"] for ddi in dwd_data_info]
+# the recent and now archives continuing the historical ones are always retrieved
+# if True, only these are retrieved, e.g. for a daily refresh followed by stage 2 with refresh = True
+refresh = False
 
 ##################################
-# HTTPS RETRIEVE
+# INITIALIZE DATA INFO
 ##################################
 
-response = [None] * len(urls)   # this will store the response of the server for each url
-errorcount = 0
+print("\nStarting discovering archives")
+station_ids, dwd_data_info = station_archives(station_ids, catalog_path, offline=offline)
+print("Found", len(dwd_data_info), "archives for", len(station_ids), "stations")
 
-print("\nStarting downloading")
-for i, url in enumerate(urls):
-    response[i] = requests.get(url)
-    
-    if response[i].status_code == 404:
-        print("Error: File not found")
-    elif response[i].status_code == 503:
-        print("Error: Service unavailable")
-    elif response[i].status_code == 401:
-        print("Error: Unauthorised (Authentication required)")
-    elif response[i].status_code == 403:
-        print("Error: Forbidden")
-    elif response[i].status_code == 200:
-        print("\tDownload successful for: " + url)
-        pass
-    else:
-        print("\tDownload failed for: " + url)
-        errorcount += 1
-print("Request terminated with", errorcount, "errors.")
-print("Finished downloading.")
+if refresh:
+    dwd_data_info = update_info(station_ids)
+else:
+    dwd_data_info = dict(dwd_data_info, **update_info(station_ids))
 
 ##################################
-# ZIP EXTRACT AND WRITE
+# HTTPS RETRIEVE
 ##################################
 
-print("\nStarting extracting and writing")
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-
-for i, file_name in enumerate(file_names):
-    with zipfile.ZipFile(io.BytesIO(response[i].content)) as z:
-        print("\tExtracting file: " + file_name)
-        z.extract(file_name, path=output_folder)
-print("Finished extracting and writing")
\ No newline at end of file
+print("\nStarting downloading")
+results, total = download_all(dwd_data_info, archive_folder, max_workers=max_workers, offline=offline,
+                              max_retries=max_retries)
+errorcount = sum(result["status"] == "error" for result in results.values())
+print_total(total, errorcount)
+print("Finished downloading.")
\ No newline at end of file
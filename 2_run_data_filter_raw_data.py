@@ -1,136 +1,118 @@
-import pandas as pd
-import numpy as np
-from datetime import datetime
 import os
 
-from dwd_data_info import dwd_data_info
+from dwd_data_info import stations, station_ids
+from dwd_download import archive_path
+from dwd_catalog import station_archives, update_info
+from dwd_reader import read_products, merge_products, read_product_chunks, merge_product_chunks, filter_raw
+from dwd_store import write_store, write_series, append_store, append_series, write_chunks
 
 ##################################
 # DEFINITIONS
 ##################################
 
-input_folder = "1_downloaded_data_files"
+input_folder = os.path.join("1_downloaded_data_files", "archives")
 output_folder = os.path.join("2_filtered_data")
+store_folder = os.path.join(output_folder, "store")     # partitioned Parquet store read by the next stages
 output_ext = ".csv"
-
-##################################
-# READING DATA
-##################################
-
-print("\nStarting reading data")
-# City hourly wind information
-df_city_hourly_mean = pd.read_csv(os.path.join(input_folder, dwd_data_info["CityHourlyMean"]["file_name"]), sep=";")    
-# City 10-minutes mean wind information
-df_city_10min_mean = pd.concat([pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMean1"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMean2"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMean3"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMean4"]["file_name"]), sep=";")])    
-
-# City 10-minutes gust wind information
-df_city_10min_max = pd.concat([pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMax1"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMax2"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMax3"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["City10MinMax4"]["file_name"]), sep=";")])    
-
-# Airport hourly mean wind information
-df_airp_hourly_mean = pd.read_csv(os.path.join(input_folder, dwd_data_info["AirpHourlyMean"]["file_name"]), sep=";")
-# Airport 10-minutes mean wind information
-df_airp_10min_mean = pd.concat([pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMean1"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMean2"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMean3"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMean4"]["file_name"]), sep=";")])    
-
-# Airport 10-minutes gust wind information
-df_airp_10min_max = pd.concat([pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMax1"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMax2"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMax3"]["file_name"]), sep=";"), 
-                      pd.read_csv(os.path.join(input_folder, dwd_data_info["Airp10MinMax4"]["file_name"]), sep=";")])    
-
-raw_data = {
-    'hourly_mean': [df_city_hourly_mean, df_airp_hourly_mean],
-    '10-minutes_mean':[df_city_10min_mean, df_airp_10min_mean],
-    '10-minutes_max':[df_city_10min_max,df_airp_10min_max]
-    }
-print("Ending reading data")
-
-##################################
-# FILTERING DATA
-##################################
-
-print("\nStarting filtering data")
-
-# case-specific formatting and filtering
-for rw in raw_data:   
-    if 'hourly' in rw:
-        columns_to_keep = ['MESS_DATUM', '   F', '   D']
-        for idx, rw_df in enumerate(raw_data[rw]):
-            rw_df = rw_df[columns_to_keep]
-            rw_df['MESS_DATUM'] = pd.to_datetime(rw_df['MESS_DATUM'], format='%Y%m%d%H')
-            rw_df = rw_df.rename(columns={'MESS_DATUM':'Date',                                    # Renaming columns to more descriptive names
-                                    '   F':'WindVelocity',
-                                    '   D':'WindDirection'})
-            # save changes
-            raw_data[rw][idx] = rw_df
-    elif '10-minutes' in rw:
-        if 'mean' in rw:
-            columns_to_keep = ['MESS_DATUM', 'FF_10', 'DD_10']
-            for idx, rw_df in enumerate(raw_data[rw]):
-                rw_df = rw_df[columns_to_keep]
-                rw_df['MESS_DATUM'] = pd.to_datetime(rw_df['MESS_DATUM'], format='%Y%m%d%H%M')
-                rw_df = rw_df.rename(columns={'MESS_DATUM':'Date',                                    # Renaming columns to more descriptive names
-                        'FF_10':'WindVelocity',
-                        'DD_10':'WindDirection'})
-                # save changes
-                raw_data[rw][idx] = rw_df         
-        elif 'max' in rw:
-            columns_to_keep = ['MESS_DATUM', 'FX_10', 'DX_10']
-            for idx, rw_df in enumerate(raw_data[rw]):
-                rw_df = rw_df[columns_to_keep]
-                rw_df['MESS_DATUM'] = pd.to_datetime(rw_df['MESS_DATUM'], format='%Y%m%d%H%M')
-                rw_df = rw_df.rename(columns={'MESS_DATUM':'Date',                                    # Renaming columns to more descriptive names
-                        'FX_10':'WindVelocity',
-                        'DX_10':'WindDirection'})
-                # save changes
-                raw_data[rw][idx] = rw_df
-                
-# general formatting and filtering
-for rw in raw_data:
-    for idx, rw_df in enumerate(raw_data[rw]):
-        rw_df = rw_df.set_index(['Date'])
-
-        # only take positive value to ba able to postprocess
-        rw_df = rw_df[rw_df.WindVelocity >= 0]
-        rw_df = rw_df[rw_df.WindDirection >= 0]
-        
-        # NOTE: enable this to only have data from automated readings in the city
-        # instead of starting from 1985 have samples from 1997
-        # if rw == 'hourly_mean' and idx == 0:
-        #     # for the hourly of the station in the city city
-        #     # using only data generated by automated stations
-        #     date_lim = datetime(1997, 7, 1)
-        #     rw_df = rw_df[rw_df.index > date_lim]
-            
-        # save changes
-        raw_data[rw][idx] = rw_df
-
-print("Ending filtering data")
-
-##################################
-# EXPORTING DATA
-##################################
-
-print("\nStarting exporting data")
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-
-raw_data['hourly_mean'][0].to_csv(os.path.join(output_folder,'wind_hourly_mean_city' + output_ext))
-raw_data['hourly_mean'][1].to_csv(os.path.join(output_folder,'wind_hourly_mean_airp' + output_ext))
-
-raw_data['10-minutes_mean'][0].to_csv(os.path.join(output_folder,'wind_10min_mean_city' + output_ext))
-raw_data['10-minutes_mean'][1].to_csv(os.path.join(output_folder,'wind_10min_mean_airp' + output_ext))
-
-raw_data['10-minutes_max'][0].to_csv(os.path.join(output_folder,'wind_10min_max_city' + output_ext))
-raw_data['10-minutes_max'][1].to_csv(os.path.join(output_folder,'wind_10min_max_airp' + output_ext))
-
-print("Ending exporting data")
\ No newline at end of file
+catalog_path = os.path.join("1_downloaded_data_files", "catalog.json")   # written by stage 1 if station_ids is set
+export_csv = False      # additionally export the series as csv files
+max_workers = None      # number of worker processes reading the product files, None uses all cores
+
+# if True, only the recent and now archives are read and their new timestamps appended to the store,
+# otherwise the store is rebuilt from the historical archives together with the recent and now ones
+refresh = False
+
+# if set, the series are streamed through in chunks of this many rows, one series after the
+# other, such that the memory use is bounded by the chunk size instead of the record length
+# e.g. chunk_size = 100000, None reads all files completely in parallel
+chunk_size = None
+chunked = chunk_size is not None and not refresh
+
+# the station or product specific filtering of the raw data is set in dwd_reader.filter_raw
+
+# the script body is guarded, as the worker processes may import this module again
+if __name__ == "__main__":
+
+    ##################################
+    # READING DATA
+    ##################################
+
+    print("\nStarting reading data")
+    # the recent and now archives are read if they have been downloaded
+    # the same stations and archives as in stage 1, from the catalog cached there
+    station_ids, dwd_data_info = station_archives(station_ids, catalog_path, offline=True)
+    updates = update_info(station_ids)
+    updates = {ddi: updates[ddi] for ddi in updates if os.path.exists(archive_path(input_folder, updates[ddi]["url"]))}
+    archives = updates if refresh else dict(dwd_data_info, **updates)
+    print("Reading", len(archives), "archives,", len(updates), "of them recent or now")
+
+    raw_data = {}
+    if not chunked:
+        # one task per product file
+        tasks = {ddi: (archive_path(input_folder, archives[ddi]["url"]), archives[ddi]["product"]) for ddi in archives}
+        frames = read_products(tasks, max_workers=max_workers)
+
+        # merging the files of each station and product in date order, in the order of station_ids
+        for product in ['hourly_mean', '10-minutes_mean', '10-minutes_max']:
+            raw_data[product] = []
+            for station_id in station_ids:
+                raw_data[product].append(merge_products([frames[ddi] for ddi in archives
+                                                         if archives[ddi]["station"] == station_id
+                                                         and archives[ddi]["product"] == product]))
+    print("Ending reading data")
+
+    ##################################
+    # FILTERING DATA
+    ##################################
+
+    print("\nStarting filtering data")
+
+    # general formatting and filtering
+    for rw in raw_data:
+        for idx, station_id in enumerate(station_ids):
+            raw_data[rw][idx] = filter_raw(raw_data[rw][idx], rw, station_id)
+
+    print("Ending filtering data")
+
+    ##################################
+    # EXPORTING DATA
+    ##################################
+
+    print("\nStarting exporting data")
+
+    if chunked:
+        # reading, filtering and writing each series chunk by chunk
+        print("Streaming the series in chunks of " + str(chunk_size) + " rows")
+        for product in ['hourly_mean', '10-minutes_mean', '10-minutes_max']:
+            for station_id in station_ids:
+                readers = [read_product_chunks(archive_path(input_folder, archives[ddi]["url"]), product, chunk_size)
+                           for ddi in archives
+                           if archives[ddi]["station"] == station_id and archives[ddi]["product"] == product]
+                chunks = (filter_raw(df, product, station_id) for df in merge_product_chunks(readers))
+                write_chunks(chunks, store_folder, station_id, product)
+
+    for product in raw_data:
+        for idx, station_id in enumerate(station_ids):
+            if refresh:
+                # only the timestamps newer than the stored ones are appended
+                appended = append_store(raw_data[product][idx], store_folder, station_id, product)
+                append_series(appended, store_folder, station_id, product)
+                print("  " + station_id + " " + product + ": " + str(len(appended)) + " new samples")
+            else:
+                write_store(raw_data[product][idx], store_folder, station_id, product)
+                write_series(raw_data[product][idx], store_folder, station_id, product)
+
+    # in refresh and chunked mode the complete series are not at hand, the csv files are written by full runs
+    if export_csv and not refresh and not chunked:
+        if not os.path.exists(output_folder):
+            os.makedirs(output_folder)
+
+        # named by the labels of stations, e.g. wind_10min_mean_city, other stations by their ID
+        labels = {station_id: name for name, station_id in stations.items()}
+        csv_names = {'hourly_mean': 'wind_hourly_mean_', '10-minutes_mean': 'wind_10min_mean_', '10-minutes_max': 'wind_10min_max_'}
+        for product in raw_data:
+            for idx, station_id in enumerate(station_ids):
+                file_name = csv_names[product] + labels.get(station_id, station_id) + output_ext
+                raw_data[product][idx].to_csv(os.path.join(output_folder, file_name))
+
+    print("Ending exporting data")
@@ -1,6 +1,5 @@
 import pandas as pd
 import numpy as np
-from scipy import stats
 import matplotlib.pyplot as plt
 import os
 
@@ -30,11 +29,18 @@ df_dir2_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_f
 df_comp_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_airp' + input_ext))
 df_comp_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_city' + input_ext))
 
-df_airp_m = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_mean_airp" + input_ext))
-df_city_m = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_mean_city" + input_ext))
+# speed histograms and Weibull fits of stage 3, a few dozen rows each whatever the length of the records
+df_hist_airp_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_histogram_airp' + input_ext))
+df_hist_city_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_histogram_city' + input_ext))
 
-df_airp_g = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_max_airp" + input_ext))
-df_city_g = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_max_city" + input_ext))
+df_hist_airp_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_histogram_airp' + input_ext))
+df_hist_city_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_histogram_city' + input_ext))
+
+df_weibull_airp_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_weibull_airp' + input_ext))
+df_weibull_city_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_weibull_city' + input_ext))
+
+df_weibull_airp_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_weibull_airp' + input_ext))
+df_weibull_city_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_weibull_city' + input_ext))
 
 print("Ending importing data")
 
@@ -90,15 +96,9 @@ plt.savefig(os.path.join(output_folder,"02_MonthWinds_city.pdf"))
 # WIND SPEED DISTRIBUTION (airport)
 fig = plt.figure(9)
 plt.title("Mean wind intensity distribution in Munich airport")
-data = df_airp_m['WindVelocity']
-binwidth = 1
-bins=range(int(min(data)), int(max(data)) + binwidth, binwidth)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-plt.plot(x_line, y_line, 'r-', label='Weibull distribution')
+# bars of the histogram exported in stage 3, the bins in the columns BinStart and BinEnd
+plt.bar(df_hist_airp_m["BinStart"], df_hist_airp_m["Density"], width=df_hist_airp_m["BinEnd"] - df_hist_airp_m["BinStart"], align='edge')
+plt.plot(df_weibull_airp_m["WindVelocity"], df_weibull_airp_m["Density"], 'r-', label='Weibull distribution')
 plt.grid()
 plt.legend()
 plt.savefig(os.path.join(output_folder,"09_Histogram_airp.png"))
@@ -107,15 +107,9 @@ plt.savefig(os.path.join(output_folder,"09_Histogram_airp.pdf"))
 # WIND SPEED DISTRIBUTION (city)
 fig = plt.figure(10)
 plt.title("Mean wind intensity distribution in Munich city")
-data = df_city_m['WindVelocity']
-binwidth = 1
-bins=range(int(min(data)), int(max(data)) + binwidth, binwidth)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-plt.plot(x_line, y_line, 'r-', label='Weibull distribution')
+# bars of the histogram exported in stage 3, the bins in the columns BinStart and BinEnd
+plt.bar(df_hist_city_m["BinStart"], df_hist_city_m["Density"], width=df_hist_city_m["BinEnd"] - df_hist_city_m["BinStart"], align='edge')
+plt.plot(df_weibull_city_m["WindVelocity"], df_weibull_city_m["Density"], 'r-', label='Weibull distribution')
 plt.grid()
 plt.legend()
 plt.savefig(os.path.join(output_folder,"10_Histogram_city.png"))
@@ -124,15 +118,9 @@ plt.savefig(os.path.join(output_folder,"10_Histogram_city.pdf"))
 # WIND SPEED DISTRIBUTION (airport)
 fig = plt.figure(11)
 plt.title("Max intensity distribution in Munich airport")
-data = df_airp_g['WindVelocity']
-binwidth = 1
-bins=range(int(min(data)), int(max(data)) + binwidth, binwidth)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-plt.plot(x_line, y_line, 'r-', label='Weibull distribution')
+# bars of the histogram exported in stage 3, the bins in the columns BinStart and BinEnd
+plt.bar(df_hist_airp_g["BinStart"], df_hist_airp_g["Density"], width=df_hist_airp_g["BinEnd"] - df_hist_airp_g["BinStart"], align='edge')
+plt.plot(df_weibull_airp_g["WindVelocity"], df_weibull_airp_g["Density"], 'r-', label='Weibull distribution')
 plt.grid()
 plt.legend()
 plt.savefig(os.path.join(output_folder,"11_Histogram_max_airp.png"))
@@ -141,15 +129,9 @@ plt.savefig(os.path.join(output_folder,"11_Histogram_max_airp.pdf"))
 # WIND GUST DISTRIBUTION (city)
 fig = plt.figure(12)
 plt.title("Max intensity distribution in Munich city")
-data = df_city_g['WindVelocity']
-binwidth = 1
-bins=range(int(min(data)), int(max(data)) + binwidth, binwidth)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-plt.plot(x_line, y_line, 'r-', label='Weibull distribution')
+# bars of the histogram exported in stage 3, the bins in the columns BinStart and BinEnd
+plt.bar(df_hist_city_g["BinStart"], df_hist_city_g["Density"], width=df_hist_city_g["BinEnd"] - df_hist_city_g["BinStart"], align='edge')
+plt.plot(df_weibull_city_g["WindVelocity"], df_weibull_city_g["Density"], 'r-', label='Weibull distribution')
 plt.grid()
 plt.legend()
 plt.savefig(os.path.join(output_folder,"11_Histogram_max_city.png"))
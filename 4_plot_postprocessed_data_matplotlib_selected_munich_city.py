@@ -1,137 +1,179 @@
-import pandas as pd
 import numpy as np
-from scipy import stats
 import matplotlib.pyplot as plt
 import os
 
+from dwd_data_info import stations
+from dwd_store import open_series
+from dwd_cache import cached_fit
+from dwd_bootstrap import bootstrap_return_levels
+from dwd_pot import pot_threshold, fit_gpd, pot_return_levels
+from dwd_decimate import minmax_decimate
+from dwd_extremes import block_maxima, fit_extremes, fit_pdf, return_levels, select_season
+
 ##################################
 # DEFINITIONS
 ##################################
 
-input_folder = os.path.join("3_postprocessed_data", "general")
-input_ext = ".csv"
+store_folder = os.path.join("2_filtered_data", "store")
 output_folder = os.path.join("4_dataplots","munich_city_matplotlib")
+cache_folder = os.path.join("4_dataplots", "fit_cache")   # fit results shared by all plotting scripts
 
-##################################
-# IMPORTING DATA
-##################################
-
-print("\nStarting importing data")
-
-df_city_m = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_mean_city" + input_ext))
-
-df_city_g = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_max_city" + input_ext))
-
-print("Ending importing data")
-
-##########
-# PLOTTING
-##########
-
-print("\nStarting plotting data")
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-
-# Munich city - mean and gust comparison over the years - as plot over time
-fig = plt.figure(1)
-# gust
-start_year = float(df_city_g["Date"].iloc[0][:4])
-end_year = float(df_city_g["Date"].iloc[-1][:4])
-pseudo_year_series = np.linspace(start_year, end_year, num=len(df_city_g["Date"]), endpoint=True)
-plt.plot(pseudo_year_series, df_city_g["WindVelocity"], 'r--', label='Gust')
-# mean
-start_year = float(df_city_m["Date"].iloc[0][:4])
-end_year = float(df_city_m["Date"].iloc[-1][:4])
-pseudo_year_series = np.linspace(start_year, end_year, num=len(df_city_m["Date"]), endpoint=True)
-plt.plot(pseudo_year_series, df_city_m["WindVelocity"], 'b-.', label='Mean')
-plt.grid()
-plt.legend()
-plt.savefig(os.path.join(output_folder,"01_MunichCity_MaxMean_Yearly.png"))
-plt.savefig(os.path.join(output_folder,"01_MunichCity_MaxMean_Yearly.pdf"))
-
-# Munich city - mean and gust comparison over the years - as histogram
-from scipy.optimize import curve_fit
-
-def gumbel_pdf(x, mu, beta):
-    return (1 / beta) * np.exp(-(x - mu) / beta - np.exp(-(x - mu) / beta))
-
-fig = plt.figure(2)
-# gust
-data = df_city_g['WindVelocity']
+season = None               # e.g. "DJF" for the maxima of one season per year instead of the annual maxima
+min_coverage = 0.8          # blocks with less of their samples present are left out
+n_years_return_period = 50
 binwidth = 0.5
-start_val = min(data)
-end_val = max(data)
-bins=np.linspace(start_val, end_val, num=int((end_val - start_val)/binwidth), endpoint=True)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-# gev (generalized extreme value) theory for bm (block maxima)
-gev_shape, gev_loc, gev_scale = stats.genextreme.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.genextreme.pdf(x_line, gev_shape, gev_loc, gev_scale)
-plt.plot(x_line, y_line, 'r--', label='GEV gust')
-
-# mean
-data = df_city_m['WindVelocity']
-binwidth = 0.5
-start_val = min(data)
-end_val = max(data)
-bins=np.linspace(start_val, end_val, num=int((end_val - start_val)/binwidth), endpoint=True)
-# using weights and fixed bins to properly normalize
-plt.hist(data, density=True, cumulative=False, weights=np.ones_like(data)*100./len(data), bins=bins)
-# gev (generalized extreme value) theory for bm (block maxima)
-gev_shape, gev_loc, gev_scale = stats.genextreme.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.genextreme.pdf(x_line, gev_shape, gev_loc, gev_scale)
-plt.plot(x_line, y_line, 'b-.', label='GEV mean')
-
-plt.grid()
-plt.legend()
-plt.savefig(os.path.join(output_folder,"02_MunichCity_MaxMean_Hist.png"))
-plt.savefig(os.path.join(output_folder,"02_MunichCity_MaxMean_Hist.pdf"))
-
-gust_sorted = np.sort(df_city_g['WindVelocity'])
-mean_sorted = np.sort(df_city_m['WindVelocity'])
-
-max_rank_gust = len(gust_sorted)
-max_rank_mean = len(mean_sorted)
-
-rank_gust = np.arange(1, max_rank_gust + 1) 
-rank_mean = np.arange(1, max_rank_mean + 1)
-
-gumbel_prob_nonexc_gust = rank_gust / (max_rank_gust + 1)
-gumbel_prob_nonexc_mean = rank_mean / (max_rank_mean + 1)
-
-gumbel_red_var_gust = -np.log(-np.log(gumbel_prob_nonexc_gust))
-gumbel_red_var_mean = -np.log(-np.log(gumbel_prob_nonexc_mean))
-
-[gumbel_slope_gust, gumbel_mode_gust] = np.polyfit(gumbel_red_var_gust, gust_sorted, 1)
-[gumbel_slope_mean, gumbel_mode_mean] = np.polyfit(gumbel_red_var_mean, mean_sorted, 1)
-
-return_period = np.arange(10, 1000, 10)
-gumbel_predicted_gustwind = gumbel_mode_gust + gumbel_slope_gust * (-np.log(-np.log(1-1/return_period)))
-gumbel_predicted_meanwind = gumbel_mode_mean + gumbel_slope_mean * (-np.log(-np.log(1-1/return_period)))
-
-n_years_return_period=50
-gumbel_predicted_gustwind_rp = gumbel_mode_gust + gumbel_slope_gust * (-np.log(-np.log(1-1/n_years_return_period)))
-gumbel_predicted_meanwind_rp = gumbel_mode_mean + gumbel_slope_mean * (-np.log(-np.log(1-1/n_years_return_period)))
-
-fig = plt.figure(3)
-# gust
-plt.plot(return_period, gumbel_predicted_gustwind, 'r--', label ='Gumbel\'s method - max')
-plt.text(200,gumbel_predicted_gustwind_rp,'Predicted max wind for ' + str(n_years_return_period) + 
-    ' year return period (m/s)\n' + ' Gumbel Method = ' + str(round(gumbel_predicted_gustwind_rp,2)))
-# mean
-plt.plot(return_period, gumbel_predicted_meanwind, 'b-.', label ='Gumbel\'s method - mean')
-plt.text(200,gumbel_predicted_meanwind_rp,'Predicted mean wind for ' + str(n_years_return_period) + 
-    ' year return period (m/s)\n' + ' Gumbel Method = ' + str(round(gumbel_predicted_meanwind_rp,2)))
-plt.axvline(n_years_return_period, color='k', linestyle='--', label = 'return period = ' + str(n_years_return_period))
-plt.ylabel('Predicted wind speed m/s')
-plt.xlabel('Return period (Years)')
-plt.title('Wind speed prediction')
-plt.grid()
-plt.legend()
-plt.savefig(os.path.join(output_folder,"03_MunichCity_MaxMean_RP50.png"))
-plt.savefig(os.path.join(output_folder,"03_MunichCity_MaxMean_RP50.pdf"))
-
-print("Ending plotting data")
\ No newline at end of file
+
+replicates = 2000           # bootstrap replicates of the confidence intervals of the return levels
+confidence = 0.95
+seed = 0                    # the intervals are reproducible for the same seed
+max_workers = None          # number of worker processes of the bootstrap, None uses all cores
+
+separation = 48 * 60        # minutes between two storms of the peaks over threshold analysis
+base_quantile = 0.99        # quantile of the gusts above which the storms are declustered
+
+nr_columns = None           # columns of the decimated time series plot, None for the pixel width of the figure
+
+# the script body is guarded, as the worker processes may import this module again
+if __name__ == "__main__":
+
+    ##################################
+    # IMPORTING DATA
+    ##################################
+
+    print("\nStarting importing data")
+
+    series_city_m = open_series(store_folder, stations["city"], "10-minutes_mean")
+    maxima_city_m = block_maxima(series_city_m["dates"], series_city_m["speed"], "season" if season else "year", min_coverage)
+    if season:
+        maxima_city_m = select_season(maxima_city_m, season)
+
+    series_city_g = open_series(store_folder, stations["city"], "10-minutes_max")
+    maxima_city_g = block_maxima(series_city_g["dates"], series_city_g["speed"], "season" if season else "year", min_coverage)
+    if season:
+        maxima_city_g = select_season(maxima_city_g, season)
+    print("\t" + str(len(maxima_city_g["maxima"])) + " years of maxima")
+
+    print("Ending importing data")
+
+    ##########
+    # PLOTTING
+    ##########
+
+    print("\nStarting plotting data")
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    # Munich city - mean and gust comparison over the years - as plot over time
+    fig = plt.figure(1)
+    # the minimum and maximum per pixel column over the real dates, instead of millions of samples
+    columns = nr_columns or int(fig.get_figwidth() * fig.dpi)
+    # gust
+    plt.plot(*minmax_decimate(series_city_g["dates"], series_city_g["speed"], columns), 'r--', label='Gust')
+    # mean
+    plt.plot(*minmax_decimate(series_city_m["dates"], series_city_m["speed"], columns), 'b-.', label='Mean')
+    plt.grid()
+    plt.legend()
+    plt.savefig(os.path.join(output_folder,"01_MunichCity_MaxMean_Yearly.png"))
+    plt.savefig(os.path.join(output_folder,"01_MunichCity_MaxMean_Yearly.pdf"))
+
+    # Munich city - annual maxima of mean and gust - as histogram
+    # the extreme value distributions are fitted to the block maxima, not to all samples
+    fig = plt.figure(2)
+    fits = {}
+    for name, maxima, style in [("gust", maxima_city_g["maxima"], 'r--'), ("mean", maxima_city_m["maxima"], 'b-.')]:
+        # using fixed bins and density to properly normalize
+        bins = np.arange(np.floor(np.min(maxima)), np.ceil(np.max(maxima)) + binwidth, binwidth)
+        plt.hist(maxima, density=True, bins=bins, alpha=0.5, label=(season or 'Annual') + ' maxima ' + name)
+        # gev (generalized extreme value) and gumbel theory for bm (block maxima)
+        fits[name] = {
+            "gev": cached_fit(cache_folder, "genextreme", maxima, lambda: fit_extremes(maxima, "genextreme")),
+            "gumbel": cached_fit(cache_folder, "gumbel_r", maxima, lambda: fit_extremes(maxima, "gumbel_r"))
+        }
+        x_line = np.linspace(np.min(maxima) - 2 * binwidth, np.max(maxima) + 2 * binwidth, 100)
+        plt.plot(x_line, fit_pdf(fits[name]["gev"], x_line), style, label='GEV ' + name)
+        plt.plot(x_line, fit_pdf(fits[name]["gumbel"], x_line), style[0] + ':', label='Gumbel ' + name)
+
+    plt.xlabel((season or 'Annual') + ' maximum wind speed m/s')
+    plt.grid()
+    plt.legend()
+    plt.savefig(os.path.join(output_folder,"02_MunichCity_MaxMean_Hist.png"))
+    plt.savefig(os.path.join(output_folder,"02_MunichCity_MaxMean_Hist.pdf"))
+
+    return_period = np.arange(10, 1000, 10)
+    # the requested period is added to the grid, such that its interval is evaluated exactly
+    bootstrap_period = np.union1d(return_period, [n_years_return_period])
+
+    # bootstrap confidence intervals of the return levels, both series in one process pool
+    bootstrap_options = {"replicates": replicates, "confidence": confidence, "seed": seed,
+                         "periods": bootstrap_period.tolist()}
+    series_maxima = {"gust": maxima_city_g["maxima"], "mean": maxima_city_m["maxima"]}
+    intervals = {method: cached_fit(cache_folder, distribution + "_bootstrap", list(series_maxima.values()),
+                                    lambda: bootstrap_return_levels(series_maxima, bootstrap_period, distribution,
+                                                                    replicates=replicates, confidence=confidence,
+                                                                    seed=seed, max_workers=max_workers),
+                                    options=bootstrap_options)
+                 for method, distribution in [("gev", "genextreme"), ("gumbel", "gumbel_r")]}
+
+    fig = plt.figure(3)
+    for name, label, style in [("gust", "max", 'r'), ("mean", "mean", 'b')]:
+        text = 'Predicted ' + label + ' wind for ' + str(n_years_return_period) + ' year return period (m/s)'
+        for method, title, line in [("gev", "GEV", '--'), ("gumbel", "Gumbel", '-.')]:
+            interval = intervals[method][name]
+            level = return_levels(fits[name][method], n_years_return_period)
+            rp_index = np.flatnonzero(np.asarray(interval["periods"]) == n_years_return_period)[0]
+            lower, upper = interval["lower"][rp_index], interval["upper"][rp_index]
+            print("\t" + str(n_years_return_period) + "-year " + name + " " + title + ": " + str(round(float(level), 2)) +
+                  " m/s, " + str(round(100 * confidence)) + "% interval " + str(round(lower, 2)) + " - " + str(round(upper, 2)) + " m/s")
+
+            plt.plot(return_period, return_levels(fits[name][method], return_period), style + line, label=title + ' - ' + label)
+            plt.fill_between(interval["periods"], interval["lower"], interval["upper"], color=style, alpha=0.15 if method == "gev" else 0.05)
+            text += '\n ' + title + ' = ' + str(round(float(level), 2)) + ' (' + str(round(lower, 2)) + ' - ' + str(round(upper, 2)) + ')'
+        plt.text(200, return_levels(fits[name]["gumbel"], n_years_return_period), text)
+    plt.axvline(n_years_return_period, color='k', linestyle='--', label = 'return period = ' + str(n_years_return_period))
+    plt.ylabel('Predicted wind speed m/s')
+    plt.xlabel('Return period (Years)')
+    plt.title('Wind speed prediction')
+    plt.grid()
+    plt.legend()
+    plt.savefig(os.path.join(output_folder,"03_MunichCity_MaxMean_RP50.png"))
+    plt.savefig(os.path.join(output_folder,"03_MunichCity_MaxMean_RP50.pdf"))
+
+    # Munich city - peaks over threshold of the gusts, declustered into storms
+    # the declustering and the threshold scans are vectorized, only the GPD fit is cached
+    pot_gust = pot_threshold(series_city_g["dates"], series_city_g["speed"], base_quantile, separation)
+    pot_options = {"threshold": pot_gust["threshold"], "years": pot_gust["years"],
+                   "separation": separation, "base_quantile": base_quantile}
+    pot_gust["fit"] = cached_fit(cache_folder, "genpareto", pot_gust["storms"]["peaks"],
+                                 lambda: fit_gpd(pot_gust["storms"]["peaks"], pot_gust["threshold"], pot_gust["years"]),
+                                 options=pot_options)
+    scan = pot_gust["scan"]
+    pot_rp = pot_return_levels(pot_gust["fit"], n_years_return_period)
+    print("\t" + str(len(pot_gust["storms"]["peaks"])) + " storms, threshold " + str(round(pot_gust["threshold"], 2)) +
+          " m/s, " + str(n_years_return_period) + "-year gust POT: " + str(round(float(pot_rp), 2)) + " m/s")
+
+    fig, axes = plt.subplots(3, 1, figsize=(6.4, 9.6))
+    axes[0].plot(scan["thresholds"], scan["mean_excess"], 'r-')
+    axes[0].fill_between(scan["thresholds"], scan["mean_excess"] - 1.96 * scan["mean_excess_se"],
+                         scan["mean_excess"] + 1.96 * scan["mean_excess_se"], color='r', alpha=0.15)
+    axes[0].set_ylabel('Mean excess m/s')
+    axes[1].plot(scan["thresholds"], scan["shape"], 'r--')
+    axes[1].set_ylabel('Shape (--)')
+    axes[1].set_xlabel('Threshold m/s')
+    axes[1].twinx().plot(scan["thresholds"], scan["modified_scale"], 'b-.')
+    fig.axes[-1].set_ylabel('Modified scale (-.)')
+    for ax in axes[:2]:
+        ax.axvline(pot_gust["threshold"], color='k', linestyle='--')
+        ax.grid()
+    axes[2].plot(return_period, pot_return_levels(pot_gust["fit"], return_period), 'r--', label='GPD - max')
+    axes[2].plot(return_period, return_levels(fits["gust"]["gev"], return_period), 'r:', label='GEV - max')
+    axes[2].axvline(n_years_return_period, color='k', linestyle='--')
+    axes[2].set_xlabel('Return period (Years)')
+    axes[2].set_ylabel('Predicted wind speed m/s')
+    axes[2].grid()
+    axes[2].legend()
+    fig.tight_layout()
+    plt.savefig(os.path.join(output_folder,"04_MunichCity_Max_POT.png"))
+    plt.savefig(os.path.join(output_folder,"04_MunichCity_Max_POT.pdf"))
+
+    print("Ending plotting data")
\ No newline at end of file
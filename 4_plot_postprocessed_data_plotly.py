@@ -1,9 +1,11 @@
 import pandas as pd
-import numpy as np
-from scipy import stats
 import plotly.express as px
 import os
 
+from dwd_data_info import stations
+from dwd_export import export_figures, print_export
+from dwd_dashboard import write_dashboard
+
 ##################################
 # DEFINITIONS
 ##################################
@@ -11,168 +13,140 @@ import os
 input_folder = os.path.join("3_postprocessed_data", "general")
 input_ext = ".csv"
 output_folder = os.path.join("4_dataplots","plotly")
+formats = ["html", "png", "svg"]
+# "dashboard": the html of all figures in one page with a tab per station, sharing one local plotly.js
+# "files": one html file per figure, each embedding plotly.js
+html_mode = "dashboard"
+max_workers = None      # number of processes exporting the static images, None uses all cores
+force = False           # if True, all figures are exported, otherwise only the ones changed since the last run
 
-##################################
-# IMPORTING DATA
-##################################
+# the script body is guarded, as the worker processes may import this module again
+if __name__ == "__main__":
 
-print("\nStarting importing data")
-
-df_ranges_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_monthly_airp' + input_ext))
-df_ranges_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_monthly_city' + input_ext))
-
-df_dir_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_coarse_airp' + input_ext))
-df_dir_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_coarse_city' + input_ext))
-
-df_dir2_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_fine_airp' + input_ext))
-df_dir2_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_fine_city' + input_ext))
-
-df_comp_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_airp' + input_ext))
-df_comp_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_city' + input_ext))
-
-df_airp_m = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_mean_airp" + input_ext))
-df_city_m = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_mean_city" + input_ext))
-
-df_airp_g = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_max_airp" + input_ext))
-df_city_g = pd.read_csv(os.path.join(input_folder,"wind_velocity_distrib_max_city" + input_ext))
-
-print("Ending importing data")
-
-##########
-# PLOTTING
-##########
-
-print("\nStarting plotting data")
-
-if not os.path.exists(output_folder):
-    os.makedirs(output_folder)
-
-# Wind speed ranges
-ranges = [2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 17.5]
-range_labels = ["<" + str(ranges[0])]
-range_labels.extend([str(ranges[i])+"-"+str(ranges[i+1]) for i in [*range(len(ranges)-1)]])
-range_labels.append(str(ranges[-1]) + ">")
-
-# MONTHLY WINDS (airport)
-fig1 = px.bar(df_ranges_a, x=df_ranges_a.index, y=range_labels, title='Monthly winds in Munich airport', labels={'index':'Month','value':'Frequency'}, color_discrete_sequence= px.colors.sequential.Plasma_r)
-fig1.write_html(os.path.join(output_folder,"01_MonthWinds_airp.html"))
-fig1.write_image(os.path.join(output_folder,"01_MonthWinds_airp.png"))
-fig1.write_image(os.path.join(output_folder,"01_MonthWinds_airp.svg"))
-
-# MONTHLY WINDS (city)
-fig2 = px.bar(df_ranges_c, x=df_ranges_c.index, y=range_labels, title='Monthly winds in Munich city', labels={'index':'Month','value':'Frequency'}, color_discrete_sequence= px.colors.sequential.Plasma_r)
-fig2.write_html(os.path.join(output_folder,"02_MonthWinds_city.html"))
-fig2.write_image(os.path.join(output_folder,"02_MonthWinds_city.png"))
-fig2.write_image(os.path.join(output_folder,"02_MonthWinds_city.svg"))
-
-# WINDROSE (airport)
-fig3 = px.bar_polar(df_dir_a, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich airport', color_discrete_sequence= px.colors.sequential.gray_r)
-fig3.write_html(os.path.join(output_folder,"03_WindRose_airp.html"))
-fig3.write_image(os.path.join(output_folder,"03_WindRose_airp.png"))
-fig3.write_image(os.path.join(output_folder,"03_WindRose_airp.svg"))
-
-# WINDROSE (city)
-fig4 = px.bar_polar(df_dir_c, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich city', color_discrete_sequence= px.colors.sequential.gray_r)
-fig4.write_html(os.path.join(output_folder,"04_WindRose_city.html"))
-fig4.write_image(os.path.join(output_folder,"04_WindRose_city.png"))
-fig4.write_image(os.path.join(output_folder,"04_WindRose_city.svg"))
-
-# PRECISE WINDROSE (airport)
-fig5 = px.bar_polar(df_dir2_a, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich airport', color_discrete_sequence= px.colors.sequential.gray_r)
-fig5.write_html(os.path.join(output_folder,"05_WindRose_precise_airp.html"))
-fig5.write_image(os.path.join(output_folder,"05_WindRose_precise_airp.png"))
-fig5.write_image(os.path.join(output_folder,"05_WindRose_precise_airp.svg"))
-
-# PRECISE WINDROSE (city)
-fig6 = px.bar_polar(df_dir2_c, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich city', color_discrete_sequence= px.colors.sequential.gray_r)
-fig6.write_html(os.path.join(output_folder,"06_WindRose_precise_city.html"))
-fig6.write_image(os.path.join(output_folder,"06_WindRose_precise_city.png"))
-fig6.write_image(os.path.join(output_folder,"06_WindRose_precise_city.svg"))
-
-# GUST vs MEAN (airport)
-fig7 = px.line(df_comp_a, x=df_comp_a.index, y=["Mean", "Max"], title='Mean vs Gust intensity in Munich airport')
-fig7.update_yaxes(range=[0,6])
-fig7.write_html(os.path.join(output_folder,"07_MeanVsMax_airp.html"))
-fig7.write_image(os.path.join(output_folder,"07_MeanVsMax_airp.png"))
-fig7.write_image(os.path.join(output_folder,"07_MeanVsMax_airp.svg"))
-
-# GUST vs MEAN (city)
-fig8 = px.line(df_comp_c, x=df_comp_c.index, y=["Mean", "Max"], title='Mean vs Gust intensity in Munich city')
-fig8.update_yaxes(range=[0,6])
-fig8.write_html(os.path.join(output_folder,"08_MeanVsMax_city.html"))
-fig8.write_image(os.path.join(output_folder,"08_MeanVsMax_city.png"))
-fig8.write_image(os.path.join(output_folder,"08_MeanVsMax_city.svg"))
-
-# WIND SPEED DISTRIBUTION (airport)
-data = df_airp_m['WindVelocity']
-binwidth = 1
-fig9 = px.histogram(df_airp_m, x='WindVelocity', histnorm='probability density', title='Wind intensity distribution in Munich airport')
-fig9.update_traces(xbins=dict( # bins used for histogram
-        start=int(min(data)),
-        end=int(max(data)),
-        size=binwidth
-    ))
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-df_line = pd.DataFrame({"x": x_line, "y": y_line})
-fig9.add_scatter(x=df_line["x"], y=df_line["y"], mode="lines", name="Weibull Distribution")
-fig9.write_html(os.path.join(output_folder,"09_Histogram_mean_airp.html"))
-fig9.write_image(os.path.join(output_folder,"09_Histogram_mean_airp.png"))
-fig9.write_image(os.path.join(output_folder,"09_Histogram_mean_airp.svg"))
-
-# WIND SPEED DISTRIBUTION (city)
-data = df_city_m['WindVelocity']
-binwidth = 1
-fig10 = px.histogram(df_city_m, x='WindVelocity', histnorm='probability density', title='Wind intensity distribution in Munich city')
-fig10.update_traces(xbins=dict( # bins used for histogram
-        start=int(min(data)),
-        end=int(max(data)),
-        size=binwidth
-    ))
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-df_line = pd.DataFrame({"x": x_line, "y": y_line})
-fig10.add_scatter(x=df_line["x"], y=df_line["y"], mode="lines", name="Weibull Distribution")
-fig10.write_html(os.path.join(output_folder,"10_Histogram_mean_city.html"))
-fig10.write_image(os.path.join(output_folder,"10_Histogram_mean_city.png"))
-fig10.write_image(os.path.join(output_folder,"10_Histogram_mean_city.svg"))
-
-# WIND GUST DISTRIBUTION (airport)
-data = df_airp_g['WindVelocity']
-binwidth = 1
-fig11 = px.histogram(df_airp_g, x='WindVelocity', histnorm='probability density', title='Gust intensity distribution in Munich airport')
-fig11.update_traces(xbins=dict( # bins used for histogram
-        start=int(min(data)),
-        end=int(max(data)),
-        size=binwidth
-    ))
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-df_line = pd.DataFrame({"x": x_line, "y": y_line})
-fig11.add_scatter(x=df_line["x"], y=df_line["y"], mode="lines", name="Weibull Distribution")
-fig11.write_html(os.path.join(output_folder,"11_Histogram_max_airp.html"))
-fig11.write_image(os.path.join(output_folder,"11_Histogram_max_airp.png"))
-fig11.write_image(os.path.join(output_folder,"11_Histogram_max_airp.svg"))
-
-# WIND GUST DISTRIBUTION (city)
-data = df_city_g['WindVelocity']
-binwidth = 1
-fig12 = px.histogram(df_city_g, x='WindVelocity', histnorm='probability density', title='Gust intensity distribution in Munich city')
-fig12.update_traces(xbins=dict( # bins used for histogram
-        start=int(min(data)),
-        end=int(max(data)),
-        size=binwidth
-    ))
-shape, loc, scale = stats.weibull_min.fit(data)
-x_line = np.linspace(np.min(data), np.max(data), 100)
-y_line = stats.weibull_min.pdf(x_line, shape, loc, scale)
-df_line = pd.DataFrame({"x": x_line, "y": y_line})
-fig12.add_scatter(x=df_line["x"], y=df_line["y"], mode="lines", name="Weibull Distribution")
-fig12.write_html(os.path.join(output_folder,"12_Histogram_max_city.html"))
-fig12.write_image(os.path.join(output_folder,"12_Histogram_max_city.png"))
-fig12.write_image(os.path.join(output_folder,"12_Histogram_max_city.svg"))
-
-print("Ending plotting data")
\ No newline at end of file
+    ##################################
+    # IMPORTING DATA
+    ##################################
+
+    print("\nStarting importing data")
+
+    df_ranges_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_monthly_airp' + input_ext))
+    df_ranges_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_monthly_city' + input_ext))
+
+    df_dir_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_coarse_airp' + input_ext))
+    df_dir_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_coarse_city' + input_ext))
+
+    df_dir2_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_fine_airp' + input_ext))
+    df_dir2_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_windrose_fine_city' + input_ext))
+
+    df_comp_a = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_airp' + input_ext))
+    df_comp_c = pd.read_csv(os.path.join(input_folder,'wind_velocity_comp_mean_vs_max_city' + input_ext))
+
+    # speed histograms and Weibull fits of stage 3, a few dozen rows each whatever the length of the records
+    df_hist_airp_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_histogram_airp' + input_ext))
+    df_hist_city_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_histogram_city' + input_ext))
+
+    df_hist_airp_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_histogram_airp' + input_ext))
+    df_hist_city_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_histogram_city' + input_ext))
+
+    df_weibull_airp_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_weibull_airp' + input_ext))
+    df_weibull_city_m = pd.read_csv(os.path.join(input_folder,'wind_velocity_mean_weibull_city' + input_ext))
+
+    df_weibull_airp_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_weibull_airp' + input_ext))
+    df_weibull_city_g = pd.read_csv(os.path.join(input_folder,'wind_velocity_max_weibull_city' + input_ext))
+
+    print("Ending importing data")
+
+    ##########
+    # PLOTTING
+    ##########
+
+    print("\nStarting plotting data")
+
+    # figures collected by name, exported together at the end
+    figures = {}
+
+    # Wind speed ranges
+    ranges = [2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 17.5]
+    range_labels = ["<" + str(ranges[0])]
+    range_labels.extend([str(ranges[i])+"-"+str(ranges[i+1]) for i in [*range(len(ranges)-1)]])
+    range_labels.append(str(ranges[-1]) + ">")
+
+    # MONTHLY WINDS (airport)
+    fig1 = px.bar(df_ranges_a, x=df_ranges_a.index, y=range_labels, title='Monthly winds in Munich airport', labels={'index':'Month','value':'Frequency'}, color_discrete_sequence= px.colors.sequential.Plasma_r)
+    figures["01_MonthWinds_airp"] = fig1
+
+    # MONTHLY WINDS (city)
+    fig2 = px.bar(df_ranges_c, x=df_ranges_c.index, y=range_labels, title='Monthly winds in Munich city', labels={'index':'Month','value':'Frequency'}, color_discrete_sequence= px.colors.sequential.Plasma_r)
+    figures["02_MonthWinds_city"] = fig2
+
+    # WINDROSE (airport)
+    fig3 = px.bar_polar(df_dir_a, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich airport', color_discrete_sequence= px.colors.sequential.gray_r)
+    figures["03_WindRose_airp"] = fig3
+
+    # WINDROSE (city)
+    fig4 = px.bar_polar(df_dir_c, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich city', color_discrete_sequence= px.colors.sequential.gray_r)
+    figures["04_WindRose_city"] = fig4
+
+    # PRECISE WINDROSE (airport)
+    fig5 = px.bar_polar(df_dir2_a, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich airport', color_discrete_sequence= px.colors.sequential.gray_r)
+    figures["05_WindRose_precise_airp"] = fig5
+
+    # PRECISE WINDROSE (city)
+    fig6 = px.bar_polar(df_dir2_c, r="Frequency", theta="Direction", color="SpeedRange [m/s]", title='Wind direction and intensity in Munich city', color_discrete_sequence= px.colors.sequential.gray_r)
+    figures["06_WindRose_precise_city"] = fig6
+
+    # GUST vs MEAN (airport)
+    fig7 = px.line(df_comp_a, x=df_comp_a.index, y=["Mean", "Max"], title='Mean vs Gust intensity in Munich airport')
+    fig7.update_yaxes(range=[0,6])
+    figures["07_MeanVsMax_airp"] = fig7
+
+    # GUST vs MEAN (city)
+    fig8 = px.line(df_comp_c, x=df_comp_c.index, y=["Mean", "Max"], title='Mean vs Gust intensity in Munich city')
+    fig8.update_yaxes(range=[0,6])
+    figures["08_MeanVsMax_city"] = fig8
+
+    # WIND SPEED DISTRIBUTION (airport)
+    # bars of the histogram exported in stage 3, each spanning its bin from BinStart to BinEnd
+    fig9 = px.bar(df_hist_airp_m, x='BinStart', y='Density', title='Wind intensity distribution in Munich airport', labels={'BinStart':'WindVelocity','Density':'probability density'})
+    fig9.update_traces(width=df_hist_airp_m["BinEnd"] - df_hist_airp_m["BinStart"], offset=0)
+    fig9.update_layout(bargap=0)
+    fig9.add_scatter(x=df_weibull_airp_m["WindVelocity"], y=df_weibull_airp_m["Density"], mode="lines", name="Weibull Distribution")
+    figures["09_Histogram_mean_airp"] = fig9
+
+    # WIND SPEED DISTRIBUTION (city)
+    # bars of the histogram exported in stage 3, each spanning its bin from BinStart to BinEnd
+    fig10 = px.bar(df_hist_city_m, x='BinStart', y='Density', title='Wind intensity distribution in Munich city', labels={'BinStart':'WindVelocity','Density':'probability density'})
+    fig10.update_traces(width=df_hist_city_m["BinEnd"] - df_hist_city_m["BinStart"], offset=0)
+    fig10.update_layout(bargap=0)
+    fig10.add_scatter(x=df_weibull_city_m["WindVelocity"], y=df_weibull_city_m["Density"], mode="lines", name="Weibull Distribution")
+    figures["10_Histogram_mean_city"] = fig10
+
+    # WIND GUST DISTRIBUTION (airport)
+    # bars of the histogram exported in stage 3, each spanning its bin from BinStart to BinEnd
+    fig11 = px.bar(df_hist_airp_g, x='BinStart', y='Density', title='Gust intensity distribution in Munich airport', labels={'BinStart':'WindVelocity','Density':'probability density'})
+    fig11.update_traces(width=df_hist_airp_g["BinEnd"] - df_hist_airp_g["BinStart"], offset=0)
+    fig11.update_layout(bargap=0)
+    fig11.add_scatter(x=df_weibull_airp_g["WindVelocity"], y=df_weibull_airp_g["Density"], mode="lines", name="Weibull Distribution")
+    figures["11_Histogram_max_airp"] = fig11
+
+    # WIND GUST DISTRIBUTION (city)
+    # bars of the histogram exported in stage 3, each spanning its bin from BinStart to BinEnd
+    fig12 = px.bar(df_hist_city_g, x='BinStart', y='Density', title='Gust intensity distribution in Munich city', labels={'BinStart':'WindVelocity','Density':'probability density'})
+    fig12.update_traces(width=df_hist_city_g["BinEnd"] - df_hist_city_g["BinStart"], offset=0)
+    fig12.update_layout(bargap=0)
+    fig12.add_scatter(x=df_weibull_city_g["WindVelocity"], y=df_weibull_city_g["Density"], mode="lines", name="Weibull Distribution")
+    figures["12_Histogram_max_city"] = fig12
+
+    print("Ending plotting data")
+
+    ##########
+    # EXPORTING
+    ##########
+
+    print("\nStarting exporting figures")
+    file_formats = formats if html_mode == "files" else [fmt for fmt in formats if fmt != "html"]
+    print_export(export_figures(figures, output_folder, file_formats, max_workers=max_workers, force=force))
+    if html_mode == "dashboard" and "html" in formats:
+        pages = {station: {name: fig for name, fig in figures.items() if name.endswith("_" + station)} for station in stations}
+        print("\t" + write_dashboard(pages, output_folder, "Wind data Munich"))
+    print("Ending exporting figures")
\ No newline at end of file
@@ -0,0 +1,84 @@
+import os
+
+from dwd_catalog import load_catalog, data_info, update_info, stations_in_state
+from dwd_download import download_all, print_total
+from dwd_binning import binning_schemes
+from dwd_batch import batch_products, run_stations, summary_table
+
+##################################
+# DEFINITIONS
+##################################
+
+# stages 1 to 3 for a list of stations, with the outputs of each station in output_folder/<station_id>
+output_folder = "5_batch_stations"
+output_ext = ".csv"
+archive_folder = os.path.join("1_downloaded_data_files", "archives")
+catalog_path = os.path.join("1_downloaded_data_files", "catalog.json")
+store_folder = os.path.join("2_filtered_data", "store")
+
+# list station IDs here, e.g. ["03379", "01262"], otherwise all stations of the federal state are run
+station_ids = []
+state = "Bayern"
+
+download = True         # if False, only the archives downloaded before are used
+offline = False         # if True, no request is made and only the cached catalog and archives are used
+max_downloads = 8       # number of parallel downloads
+max_workers = None      # number of worker processes, one station at a time each, None uses all cores
+chunk_size = None       # if set, each worker streams its series in chunks of this many rows
+
+schemes = binning_schemes
+start = None            # date window of the tables, None for all the data
+end = None
+
+# the script body is guarded, as the worker processes may import this module again
+if __name__ == "__main__":
+
+    ##################################
+    # DISCOVERING STATIONS
+    ##################################
+
+    print("\nStarting discovering stations")
+    catalog = load_catalog(catalog_path, offline=offline)
+    if not station_ids:
+        station_ids = stations_in_state(catalog, state)
+    archives = dict(data_info(catalog, station_ids, batch_products), **update_info(station_ids, batch_products))
+    print("Found", len(archives), "archives for", len(station_ids), "stations")
+    print("Ending discovering stations")
+
+    ##################################
+    # DOWNLOADING
+    ##################################
+
+    if download:
+        print("\nStarting downloading")
+        results, total = download_all(archives, archive_folder, max_workers=max_downloads, offline=offline)
+        errorcount = sum(result["status"] == "error" for result in results.values())
+        print_total(total, errorcount)
+        print("Ending downloading")
+
+    ##################################
+    # PROCESSING STATIONS
+    ##################################
+
+    print("\nStarting processing stations")
+    summaries = run_stations(station_ids, archives, archive_folder, store_folder, output_folder, schemes,
+                             start=start, end=end, chunk_size=chunk_size, max_workers=max_workers)
+    for station_id, summary in summaries.items():
+        if summary["Status"] != "ok":
+            print("  " + station_id + ": " + summary["Status"] + " " + summary.get("Error", ""))
+    print("Ending processing stations")
+
+    ##################################
+    # EXPORTING SUMMARY
+    ##################################
+
+    print("\nStarting exporting summary")
+
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    df_summary = summary_table(summaries, catalog)
+    df_summary.to_csv(os.path.join(output_folder, 'stations_summary' + output_ext))
+    print(str((df_summary["Status"] == "ok").sum()) + " of " + str(len(df_summary)) + " stations processed")
+
+    print("Ending exporting summary")
@@ -0,0 +1,188 @@
+'''
+Batch processing of many stations
+
+Stage 2 and 3 are run for one station at a time, such that the stations can be distributed
+over worker processes: the archives of the station are read, filtered and written to the
+store, then counted into the cubes and exported as tables to
+    <output_folder>/<station_id>/<scheme>/
+with the speed histograms and Weibull fits in <output_folder>/<station_id>.
+Each station returns a summary row, which are joined into one cross-station table.
+
+A station failing, e.g. because of a missing or broken archive, does not stop the batch,
+its error is reported in the summary instead.
+'''
+
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from dwd_binning import (months, merged_ranges, scheme_sectors, direction_base_edges, reduce_schemes,
+                         scheme_frames, sector_table, sector_labels)
+from dwd_cube import update_cube, window_counts, window_mean, window_mask, window_histogram
+from dwd_download import archive_path
+from dwd_fit import distribution_artifacts
+from dwd_reader import read_product, merge_products, read_product_chunks, merge_product_chunks, filter_raw
+from dwd_store import write_store, write_series, write_chunks
+
+batch_products = ["10-minutes_mean", "10-minutes_max"]
+histogram_binwidth = 1.0
+
+
+def station_paths(archives, archive_folder, station_id, product):
+    '''
+    Paths of the downloaded archives of station_id and product
+    '''
+    paths = [archive_path(archive_folder, archives[key]["url"]) for key in archives
+             if archives[key]["station"] == station_id and archives[key]["product"] == product]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def store_station(archives, archive_folder, store_folder, station_id, products=batch_products, chunk_size=None):
+    '''
+    Stage 2 for one station: read, merge and filter its archives and write them to the store,
+    returns the products written
+    '''
+    written = []
+    for product in products:
+        paths = station_paths(archives, archive_folder, station_id, product)
+        if not paths:
+            continue
+        if chunk_size is None:
+            df = filter_raw(merge_products([read_product(path, product) for path in paths]), product, station_id)
+            write_store(df, store_folder, station_id, product)
+            write_series(df, store_folder, station_id, product)
+        else:
+            readers = [read_product_chunks(path, product, chunk_size) for path in paths]
+            write_chunks((filter_raw(df, product, station_id) for df in merge_product_chunks(readers)), store_folder, station_id, product)
+        written.append(product)
+    return written
+
+
+def station_summary(cube_m, cube_g, schemes, start=None, end=None):
+    '''
+    Summary of one station within the date window, from its mean and gust cubes
+    '''
+    mask = window_mask(cube_m, start, end)
+    years = cube_m["years"][mask.any(axis=1)]
+    samples = (cube_m["samples"] * mask[:, :, None]).sum()
+    sums = (cube_m["sums"] * mask[:, :, None]).sum()
+
+    summary = {
+        "FirstYear": int(years[0]) if len(years) else np.nan,
+        "LastYear": int(years[-1]) if len(years) else np.nan,
+        "Samples": int(samples),
+        "MeanSpeed": sums / 10 / samples if samples else np.nan
+    }
+
+    # prevailing direction in the first sector layout of the first scheme
+    layout = list(list(schemes.values())[0]["sectors"].values())[0]
+    counts = window_counts(cube_m, start, end)
+    per_sector = sector_table(counts, cube_m["base_edges"], layout["direction_nr"], layout.get("offset", 0.0)).sum(axis=1)
+    if per_sector.sum():
+        summary["PrevailingDirection"] = sector_labels(layout)[int(np.argmax(per_sector))]
+        summary["PrevailingShare"] = per_sector.max() / per_sector.sum()
+    else:
+        summary["PrevailingDirection"] = None
+        summary["PrevailingShare"] = np.nan
+
+    if cube_g is not None:
+        mask = window_mask(cube_g, start, end)
+        samples = (cube_g["samples"] * mask[:, :, None]).sum()
+        sums = (cube_g["sums"] * mask[:, :, None]).sum()
+        maxima = np.where(mask[:, :, None], cube_g["maxima"], np.nan)
+        summary["MeanGust"] = sums / 10 / samples if samples else np.nan
+        summary["MaxGust"] = float(np.nanmax(maxima)) if np.isfinite(maxima).any() else np.nan
+    else:
+        summary["MeanGust"] = np.nan
+        summary["MaxGust"] = np.nan
+    return summary
+
+
+def tables_station(store_folder, output_folder, station_id, schemes, products, start=None, end=None,
+                   output_ext=".csv", chunk_size=None):
+    '''
+    Stage 3 for one station: update its cubes and export the tables of all schemes,
+    returns the summary of the station
+    '''
+    ranges = merged_ranges(schemes)
+    base_edges = direction_base_edges(scheme_sectors(schemes))
+
+    cube_m, _ = update_cube(store_folder, station_id, "10-minutes_mean", ranges, base_edges, chunk_size)
+    cube_g = None
+    if "10-minutes_max" in products:
+        cube_g, _ = update_cube(store_folder, station_id, "10-minutes_max", ranges, base_edges, chunk_size)
+
+    results = reduce_schemes(window_counts(cube_m, start, end), ranges, base_edges, schemes)
+    for scheme_name, scheme in schemes.items():
+        scheme_folder = os.path.join(output_folder, station_id, scheme_name)
+        if not os.path.exists(scheme_folder):
+            os.makedirs(scheme_folder)
+        for table, df in scheme_frames(results[scheme_name], scheme).items():
+            df.to_csv(os.path.join(scheme_folder, 'wind_velocity_mean_' + table + output_ext))
+
+    df_comp = pd.DataFrame(index=months, columns=["Mean", "Max"])
+    df_comp.index.name = "Months"
+    df_comp["Mean"] = window_mean(cube_m, start, end)
+    df_comp["Max"] = window_mean(cube_g, start, end) if cube_g is not None else np.nan
+    df_comp.to_csv(os.path.join(output_folder, station_id, 'wind_velocity_comp_mean_vs_max' + output_ext))
+
+    summary = station_summary(cube_m, cube_g, schemes, start, end)
+    for kind, cube in [("mean", cube_m), ("max", cube_g)]:
+        if cube is None or not window_histogram(cube, start, end).any():
+            continue
+        artifacts = distribution_artifacts(cube, start, end, histogram_binwidth)
+        artifacts["histogram"].to_csv(os.path.join(output_folder, station_id, 'wind_velocity_' + kind + '_histogram' + output_ext), index=False)
+        artifacts["curve"].to_csv(os.path.join(output_folder, station_id, 'wind_velocity_' + kind + '_weibull' + output_ext), index=False)
+        if kind == "mean":
+            summary["WeibullShape"] = artifacts["fit"]["shape"]
+            summary["WeibullScale"] = artifacts["fit"]["scale"]
+    return summary
+
+
+def run_station(station_id, archives, archive_folder, store_folder, output_folder, schemes,
+                products=batch_products, start=None, end=None, chunk_size=None):
+    '''
+    Stage 2 and 3 for one station, returns its summary with the "Status"
+    '''
+    try:
+        written = store_station(archives, archive_folder, store_folder, station_id, products, chunk_size)
+        if "10-minutes_mean" not in written:
+            return {"Status": "no data"}
+        summary = tables_station(store_folder, output_folder, station_id, schemes, written, start, end,
+                                 chunk_size=chunk_size)
+        summary["Status"] = "ok"
+        return summary
+    except Exception as e:
+        return {"Status": "error", "Error": str(e), "Traceback": traceback.format_exc()}
+
+
+def run_stations(station_ids, archives, archive_folder, store_folder, output_folder, schemes,
+                 products=batch_products, start=None, end=None, chunk_size=None, max_workers=None):
+    '''
+    Stage 2 and 3 for several stations across a process pool, one station per task,
+    returns the summaries as dict keyed by station ID
+    '''
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {station_id: executor.submit(run_station, station_id, archives, archive_folder, store_folder,
+                                               output_folder, schemes, products, start, end, chunk_size)
+                   for station_id in station_ids}
+        return {station_id: future.result() for station_id, future in futures.items()}
+
+
+def summary_table(summaries, catalog=None):
+    '''
+    Cross-station table of the summaries, with the station descriptions of the catalog if given
+    '''
+    rows = []
+    for station_id, summary in summaries.items():
+        row = {"Station": station_id}
+        if catalog is not None:
+            station = catalog["stations"].get(station_id, {})
+            for key in ["name", "state", "lat", "lon", "height"]:
+                row[key.capitalize()] = station.get(key)
+        row.update({key: value for key, value in summary.items() if key != "Traceback"})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index("Station")
@@ -0,0 +1,316 @@
+'''
+Binning of the wind samples by month, direction sector and speed range
+
+Each sample is digitized only once: month, direction and speed are turned into integer bin
+indices and counted with a single np.bincount into a cube of shape
+    (12 months, direction base bins, speed bins)
+from which the monthly tables and the wind roses of any sector count are then derived.
+
+The direction base bins are delimited by the union of the sector edges of all the wind roses
+requested, e.g. 8 sectors of 45 deg centered on N and 36 sectors of 10 deg centered on 0 deg.
+Every sector is therefore an exact union of base bins.
+
+All bins are closed on the lower edge and open on the upper edge, i.e. a speed of 2.5 m/s
+falls into "2.5-5.0" and a direction of 22.5 deg into the NE sector.
+
+A binning scheme defines the speed ranges with their labels and unit, as well as the sector
+layouts (sector count and offset) of its wind roses. Several schemes are evaluated over one
+single scan of the data: the cube is counted over the union of the speed ranges and sector
+edges of all schemes, and each scheme's tables are then sums over that cube.
+'''
+
+import numpy as np
+import pandas as pd
+
+nr_months = 12
+total_range = 360.0
+
+months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+days_per_month = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+compass_directions = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+
+# the speeds are given in steps of 0.1 m/s, the histogram for the distribution fits
+# counts each of these values up to 60 m/s
+histogram_resolution = 0.1
+nr_histogram_bins = 601
+
+binning_schemes = {
+    "general": {
+        "ranges": [2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 17.5],
+        "range_labels": [2.5, 5.0, 7.5, 10.0, 12.5, 15.0, 17.5],
+        "unit": "m/s",
+        "sectors": {
+            # 8 directions = 360/8 = 45 deg precision
+            "windrose_coarse": {"direction_nr": 8, "offset": 0.0, "labels": compass_directions},
+            # 36 directions = 360/36 = 10 deg precision
+            "windrose_fine": {"direction_nr": 36, "offset": 0.0}
+        }
+    },
+    # for comparison with MeteoBlue data:
+    # they have ranges in km/h: "<1","1-5","5-12","12-19","19-28","28-38","38-50","50-61",">61"
+    # the conversion factor is dividing by 3.6 to get to m/s
+    # km/h -> [1.00, 5.00, 12.00, 19.00, 28.00, 38.00, 50.00, 61.00]
+    # m/s  -> [0.28, 1.39,  3.33,  5.28,  7.78, 10.56, 13.89, 16.95]
+    "comp_meteoblue": {
+        "ranges": [0.28, 1.39, 3.33, 5.28, 7.78, 10.56, 13.89, 16.95],
+        "range_labels": [1.00, 5.00, 12.00, 19.00, 28.00, 38.00, 50.00, 61.00],
+        "unit": "km/h",
+        "sectors": {
+            "windrose_fine": {"direction_nr": 36, "offset": 0.0}
+        }
+    }
+}
+
+
+def speed_histogram(speed, nr_bins=None, resolution=histogram_resolution):
+    '''
+    Number of samples per speed value, the speeds given in steps of resolution,
+    the speeds beyond the last bin are counted in the last bin
+    '''
+    speed = np.asarray(speed)
+    steps = np.rint(speed[np.isfinite(speed)] / resolution).astype(np.int64)
+    if nr_bins is None:
+        nr_bins = int(steps.max()) + 1 if len(steps) else 1
+    return np.bincount(np.clip(steps, 0, nr_bins - 1), minlength=nr_bins)
+
+
+def histogram_edges(nr_bins, resolution=histogram_resolution):
+    '''
+    Edges of the bins of speed_histogram, bin i holds the speeds rounded to i * resolution,
+    the first bin starts at 0 and the last one is open
+    '''
+    edges = (np.arange(nr_bins + 1) - 0.5) * resolution
+    edges[0] = 0.0
+    edges[-1] = np.inf
+    return edges
+
+
+def rebin_histogram(counts, binwidth=1.0, resolution=histogram_resolution):
+    '''
+    Counts of speed_histogram in bins [k, k + 1) * binwidth, binwidth being a multiple of
+    resolution, from the first to the last bin with samples, as (edges, counts)
+    '''
+    counts = np.asarray(counts)
+    step = int(round(binwidth / resolution))
+    nonzero = np.flatnonzero(counts)
+    if not len(nonzero):
+        return np.zeros(1), np.zeros(0, dtype=counts.dtype)
+    first, last = nonzero[0] // step, nonzero[-1] // step
+    rebinned = np.add.reduceat(counts, np.arange(first, last + 1) * step)
+    return np.arange(first, last + 2) * binwidth, rebinned
+
+
+def histogram_frame(edges, counts):
+    '''
+    Table of a histogram with the bins, their counts and the probability density
+    '''
+    widths = np.diff(edges)
+    total = counts.sum()
+    return pd.DataFrame({
+        "BinStart": edges[:-1],
+        "BinEnd": edges[1:],
+        "Count": counts,
+        "Density": counts / (total * widths) if total else np.zeros(len(counts))
+    })
+
+
+def months_of(dates):
+    '''
+    Month 1...12 of datetime64 dates
+    '''
+    return np.asarray(dates).astype("datetime64[M]").astype("int64") % 12 + 1
+
+
+def range_labels(ranges):
+    '''
+    Labels of the speed bins delimited by ranges, e.g. ["<2.5", "2.5-5.0", ..., "17.5>"]
+    '''
+    labels = ["<" + str(ranges[0])]
+    labels.extend([str(ranges[i]) + "-" + str(ranges[i+1]) for i in range(len(ranges) - 1)])
+    labels.append(str(ranges[-1]) + ">")
+    return labels
+
+
+def sector_edges(direction_nr, offset=0.0):
+    '''
+    Lower edges of direction_nr sectors, the first one centered on offset
+    '''
+    slice_size = total_range / direction_nr
+    return (offset - slice_size / 2 + slice_size * np.arange(direction_nr)) % total_range
+
+
+def direction_base_edges(sectors):
+    '''
+    Sorted union of the lower edges of all sector layouts, given as list of (direction_nr, offset)
+    '''
+    return np.unique(np.concatenate([sector_edges(direction_nr, offset) for direction_nr, offset in sectors]))
+
+
+def direction_bins(direction, base_edges):
+    '''
+    Index of the base bin of each direction, the last bin wraps around 360 deg
+    '''
+    idx = np.searchsorted(base_edges, np.asarray(direction) % total_range, side="right") - 1
+    idx[idx < 0] = len(base_edges) - 1
+    return idx
+
+
+def speed_bins(speed, ranges):
+    '''
+    Index of the speed bin of each speed, 0 below ranges[0] and len(ranges) from ranges[-1] on
+    '''
+    return np.searchsorted(np.asarray(ranges, dtype=np.float64), speed, side="right")
+
+
+def count_cube(month, direction, speed, ranges, base_edges):
+    '''
+    Number of samples per (month, direction base bin, speed bin), in a single pass
+    '''
+    nr_dir = len(base_edges)
+    nr_speed = len(ranges) + 1
+    flat = ((np.asarray(month, dtype=np.int64) - 1) * nr_dir + direction_bins(direction, base_edges)) * nr_speed
+    flat += speed_bins(speed, ranges)
+    return np.bincount(flat, minlength=nr_months * nr_dir * nr_speed).reshape(nr_months, nr_dir, nr_speed)
+
+
+def sector_of_base_bins(base_edges, direction_nr, offset=0.0):
+    '''
+    Sector 0...direction_nr-1 each direction base bin belongs to, judged by the bin center
+    '''
+    slice_size = total_range / direction_nr
+    widths = np.diff(np.append(base_edges, base_edges[0] + total_range))
+    centers = base_edges + widths / 2
+    return np.floor(((centers - offset + slice_size / 2) % total_range) / slice_size).astype(np.int64) % direction_nr
+
+
+def monthly_table(cube):
+    '''
+    Number of samples per (month, speed bin)
+    '''
+    return cube.sum(axis=1)
+
+
+def sector_table(cube, base_edges, direction_nr, offset=0.0):
+    '''
+    Number of samples per (sector, speed bin) over all months
+    '''
+    per_base_bin = cube.sum(axis=0)
+    table = np.zeros((direction_nr, per_base_bin.shape[1]), dtype=per_base_bin.dtype)
+    np.add.at(table, sector_of_base_bins(base_edges, direction_nr, offset), per_base_bin)
+    return table
+
+
+def monthly_mean(month, values):
+    '''
+    Mean of values per month 1...12
+    '''
+    month = np.asarray(month, dtype=np.int64) - 1
+    sums = np.bincount(month, weights=values, minlength=nr_months)
+    counts = np.bincount(month, minlength=nr_months)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def merged_ranges(schemes):
+    '''
+    Sorted union of the speed ranges of all schemes
+    '''
+    return np.unique(np.concatenate([np.asarray(scheme["ranges"], dtype=np.float64) for scheme in schemes.values()]))
+
+
+def scheme_sectors(schemes):
+    '''
+    All sector layouts of the schemes as list of (direction_nr, offset)
+    '''
+    return [(layout["direction_nr"], layout.get("offset", 0.0))
+            for scheme in schemes.values() for layout in scheme["sectors"].values()]
+
+
+def speed_bin_map(ranges, scheme_ranges):
+    '''
+    Speed bin of scheme_ranges each bin of the finer ranges belongs to
+    '''
+    lower_edges = np.concatenate([[-np.inf], ranges])
+    return np.searchsorted(np.asarray(scheme_ranges, dtype=np.float64), lower_edges, side="right")
+
+
+def reduce_speed_bins(cube, bin_map, nr_speed):
+    '''
+    Sum the last axis of cube into nr_speed bins according to bin_map
+    '''
+    one_hot = np.zeros((len(bin_map), nr_speed), dtype=cube.dtype)
+    one_hot[np.arange(len(bin_map)), bin_map] = 1
+    return cube @ one_hot
+
+
+def evaluate_schemes(month, direction, speed, schemes):
+    '''
+    Count cube of every scheme, all computed from a single pass over the samples
+
+    Returns a dict with the same keys as schemes, each with the "cube" of shape
+    (12 months, direction base bins, speed bins of the scheme) and its "base_edges".
+    '''
+    ranges = merged_ranges(schemes)
+    base_edges = direction_base_edges(scheme_sectors(schemes))
+    cube = count_cube(month, direction, speed, ranges, base_edges)
+    return reduce_schemes(cube, ranges, base_edges, schemes)
+
+
+def reduce_schemes(cube, ranges, base_edges, schemes):
+    '''
+    Count cube of every scheme from a cube counted over ranges and base_edges,
+    which must contain the speed ranges and sector edges of all schemes
+    '''
+    results = {}
+    for name, scheme in schemes.items():
+        bin_map = speed_bin_map(ranges, scheme["ranges"])
+        results[name] = {
+            "cube": reduce_speed_bins(cube, bin_map, len(scheme["ranges"]) + 1),
+            "base_edges": base_edges
+        }
+    return results
+
+
+def sector_labels(layout):
+    '''
+    Labels of the sectors of a layout, the sector centers in degrees unless given
+    '''
+    if "labels" in layout:
+        return layout["labels"]
+    slice_size = total_range / layout["direction_nr"]
+    centers = (layout.get("offset", 0.0) + slice_size * np.arange(layout["direction_nr"])) % total_range
+    return [int(center) if float(center).is_integer() else float(center) for center in centers]
+
+
+def monthly_frame(cube, scheme):
+    '''
+    Frequency of the speed ranges per month, rescaled to the number of days in each month
+    '''
+    counts = monthly_table(cube).astype(float)
+    counts = counts / counts.sum(axis=1, keepdims=True) * np.array(days_per_month)[:, None]
+    df = pd.DataFrame(counts, index=months, columns=range_labels(scheme["range_labels"]))
+    df.index.name = "Months"
+    return df
+
+
+def sector_frame(cube, base_edges, scheme, layout):
+    '''
+    Frequency of the speed ranges per sector, in "long" format as used for the wind roses
+    '''
+    table = sector_table(cube, base_edges, layout["direction_nr"], layout.get("offset", 0.0)).astype(float)
+    df = pd.DataFrame(table, index=sector_labels(layout), columns=range_labels(scheme["range_labels"]))
+    df = pd.melt(df.reset_index(), id_vars=['index'], var_name='SpeedRange [' + scheme["unit"] + ']', value_name='Frequency')
+    df.rename(columns={'index': 'Direction'}, inplace=True)
+    df.index.name = "RangeTimesDirCount"
+    return df
+
+
+def scheme_frames(result, scheme):
+    '''
+    All tables of a scheme from its evaluated cube, as dict of DataFrames
+    with "monthly" and one entry per sector layout
+    '''
+    frames = {"monthly": monthly_frame(result["cube"], scheme)}
+    for name, layout in scheme["sectors"].items():
+        frames[name] = sector_frame(result["cube"], result["base_edges"], scheme, layout)
+    return frames
@@ -0,0 +1,206 @@
+'''
+Bootstrap confidence intervals of the return levels
+
+The block maxima are resampled with replacement, the distribution fitted again to each
+replicate and the return levels evaluated. The percentiles of the replicate levels give the
+confidence interval around the levels of the fit to the original maxima.
+
+The replicates are drawn in batches as one (batch size, number of maxima) index array.
+Gumbel fits are vectorized over all rows of a batch: the L-moments directly, maximum
+likelihood by Newton iterations of the scale equation, so thousands of replicates take
+milliseconds. GEV fits need an optimization per replicate: a Nelder-Mead search from the
+parameters of the original fit, stepped for all rows of a batch at once, with the batches
+spread across a process pool.
+
+Reproducibility: each series draws from its own np.random.SeedSequence built from the seed
+and its name, spawned into one child sequence per batch. The results therefore do not
+depend on the number of workers, the order of the series or the other series in the call.
+'''
+
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import stats
+
+from dwd_extremes import euler_gamma, fit_extremes, return_levels
+
+default_replicates = 2000
+default_batch_size = 250
+
+
+def resample(rng, maxima, size):
+    '''
+    Replicates of the maxima as rows of a (size, number of maxima) array
+    '''
+    return maxima[rng.integers(0, len(maxima), (size, len(maxima)))]
+
+
+def gumbel_rows(samples, method="lmoments", iterations=50):
+    '''
+    Location and scale of the Gumbel fit of each row, as (rows, 2) array
+
+    Rows drawing the same maximum in every position have no spread to fit, they are NaN.
+    '''
+    x = np.sort(samples, axis=1)
+    n = x.shape[1]
+    l1 = x.mean(axis=1)
+    l2 = 2 * (x * np.arange(n)).sum(axis=1) / (n * (n - 1)) - l1
+    valid = x[:, -1] > x[:, 0]
+    params = np.full((len(x), 2), np.nan)
+    scale = l2[valid] / np.log(2)
+    params[valid] = np.column_stack([l1[valid] - euler_gamma * scale, scale])
+    if method == "lmoments":
+        return params
+
+    # maximum likelihood: scale = mean(x) - sum(x w) / sum(w), w = exp(-x / scale)
+    x = x[valid]
+    xs = x - x[:, :1]
+    for _ in range(iterations):
+        w = np.exp(-xs / scale[:, None])
+        s0, s1, s2 = w.sum(axis=1), (xs * w).sum(axis=1), (xs ** 2 * w).sum(axis=1)
+        g = scale - xs.mean(axis=1) + s1 / s0
+        dg = 1 + (s2 * s0 - s1 ** 2) / (s0 * scale) ** 2
+        step = g / dg
+        scale = np.maximum(scale - step, scale / 2)
+        if np.all(np.abs(step) < 1e-10 * scale):
+            break
+    w = np.exp(-xs / scale[:, None])
+    params[valid] = np.column_stack([x[:, 0] - scale * np.log(w.mean(axis=1)), scale])
+    return params
+
+
+def gev_nll(params, x):
+    '''
+    Negative log-likelihood of the GEV distribution of each row of x, params being
+    (c, loc, log scale) as (rows, points, 3) array, returns (rows, points)
+
+    Shapes closer to 0 than 1e-8 are evaluated at 1e-8, which is the Gumbel limit within
+    the precision of the fit.
+    '''
+    c, loc, log_scale = params[..., 0:1], params[..., 1:2], params[..., 2]
+    c = np.where(np.abs(c) < 1e-8, np.copysign(1e-8, c), c)
+    t = 1 - c * (x[:, None, :] - loc) / np.exp(params[..., 2:3])
+    with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+        log_t = np.log(t)
+        nll = ((1 - 1 / c) * log_t + np.exp(log_t / c)).sum(axis=2) + x.shape[1] * log_scale
+    nll[~np.isfinite(nll)] = np.inf
+    return nll
+
+
+def gev_rows(samples, start, iterations=1000, xatol=1e-4, fatol=1e-6):
+    '''
+    Shape, location and scale of the GEV fit of each row, started from start, as (rows, 3) array
+
+    Nelder-Mead on (c, loc, log scale) with the coefficients of scipy.optimize, run for all
+    rows at once: each step evaluates the trial points of the rows not yet converged in one
+    call. Rows not converged within the iterations are NaN.
+    '''
+    rows, nr_params = len(samples), 3
+    simplex = np.tile([start[0], start[1], np.log(start[2])], (rows, nr_params + 1, 1))
+    simplex[:, 1:, :] += np.diag([0.05, 0.05 * max(abs(start[1]), 1.0), 0.05])
+    values = gev_nll(simplex, samples)
+    active = np.arange(rows)
+
+    for _ in range(iterations):
+        order = np.argsort(values[active], axis=1)
+        s = np.take_along_axis(simplex[active], order[:, :, None], axis=1)
+        v = np.take_along_axis(values[active], order, axis=1)
+        simplex[active], values[active] = s, v
+        running = ~((np.abs(s[:, 1:] - s[:, :1]).max(axis=(1, 2)) <= xatol) &
+                    (np.abs(v[:, 1:] - v[:, :1]).max(axis=1) <= fatol))
+        active, s, v = active[running], s[running], v[running]
+        if not len(active):
+            break
+
+        # reflection, expansion, outside and inside contraction of the worst point
+        centroid = s[:, :-1].mean(axis=1)
+        trials = centroid[:, None, :] + np.array([1.0, 2.0, 0.5, -0.5])[:, None] * (centroid - s[:, -1])[:, None, :]
+        f_trials = gev_nll(trials, samples[active])
+        f_r, f_e, f_oc, f_ic = f_trials.T
+
+        choice = np.full(len(active), -1)
+        expand = f_r < v[:, 0]
+        choice[expand] = np.where(f_e < f_r, 1, 0)[expand]
+        choice[~expand & (f_r < v[:, -2])] = 0
+        outside = (choice < 0) & (f_r < v[:, -1])
+        choice[outside & (f_oc <= f_r)] = 2
+        choice[(choice < 0) & ~outside & (f_ic < v[:, -1])] = 3
+
+        accept = np.flatnonzero(choice >= 0)
+        s[accept, -1] = trials[accept, choice[accept]]
+        v[accept, -1] = f_trials[accept, choice[accept]]
+
+        shrink = choice < 0
+        if shrink.any():
+            s[shrink, 1:] = s[shrink, :1] + 0.5 * (s[shrink, 1:] - s[shrink, :1])
+            v[shrink, 1:] = gev_nll(s[shrink, 1:], samples[active[shrink]])
+        simplex[active], values[active] = s, v
+
+    params = simplex[:, 0].copy()
+    params[:, 2] = np.exp(params[:, 2])
+    params[active] = np.nan
+    params[~np.isfinite(values[:, 0])] = np.nan
+    return params
+
+
+def batch_levels(maxima, distribution, method, start, periods, seed, size):
+    '''
+    Return levels of one batch of replicates, as (size, number of periods) array
+    '''
+    samples = resample(np.random.default_rng(seed), maxima, size)
+    if distribution == "gumbel_r":
+        params = gumbel_rows(samples, method)
+    else:
+        params = gev_rows(samples, start)
+    q = 1 - 1 / np.asarray(periods, dtype=np.float64)
+    return getattr(stats, distribution).ppf(q[None, :], *[param[:, None] for param in params.T])
+
+
+def batch_seeds(seed, name, nr_batches):
+    return np.random.SeedSequence([seed, zlib.crc32(name.encode())]).spawn(nr_batches)
+
+
+def bootstrap_return_levels(series, periods, distribution="genextreme", method="mle",
+                            replicates=default_replicates, batch_size=default_batch_size,
+                            confidence=0.95, seed=0, max_workers=None):
+    '''
+    Bootstrap confidence intervals of the return levels of several series of block maxima
+
+    series is a dict of the maxima by name, e.g. stations or sectors. All batches of all
+    series share one process pool, Gumbel batches are computed in this process. Returns a
+    dict by name with "periods", "levels" of the original fit, "lower" and "upper" bounds of
+    the confidence interval and the number of "replicates" fitted successfully.
+    '''
+    periods = np.atleast_1d(np.asarray(periods, dtype=np.float64))
+    sizes = [batch_size] * (replicates // batch_size) + ([replicates % batch_size] if replicates % batch_size else [])
+    fits = {name: fit_extremes(maxima, distribution, method) for name, maxima in series.items()}
+
+    tasks = {name: [(np.asarray(maxima, dtype=np.float64), distribution, method, fits[name]["params"], periods, seed_batch, size)
+                    for seed_batch, size in zip(batch_seeds(seed, name, len(sizes)), sizes)]
+             for name, maxima in series.items()}
+    if distribution == "gumbel_r" or max_workers == 1:
+        levels = {name: [batch_levels(*task) for task in name_tasks] for name, name_tasks in tasks.items()}
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {name: [executor.submit(batch_levels, *task) for task in name_tasks]
+                       for name, name_tasks in tasks.items()}
+            levels = {name: [future.result() for future in name_futures] for name, name_futures in futures.items()}
+
+    alpha = (1 - confidence) / 2
+    results = {}
+    for name, batches in levels.items():
+        replicate_levels = np.concatenate(batches)
+        valid = np.all(np.isfinite(replicate_levels), axis=1)
+        lower, upper = np.percentile(replicate_levels[valid], [100 * alpha, 100 * (1 - alpha)], axis=0)
+        results[name] = {
+            "distribution": distribution,
+            "method": method,
+            "periods": periods,
+            "levels": return_levels(fits[name], periods),
+            "lower": lower,
+            "upper": upper,
+            "confidence": confidence,
+            "replicates": int(valid.sum())
+        }
+    return results
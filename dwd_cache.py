@@ -0,0 +1,116 @@
+'''
+On-disk cache of the distribution fits
+
+A fit is identified by the fingerprint of its input data, the distribution and the fit
+options. Its result is stored as json file named by the fingerprint in the cache folder,
+shared by all plotting scripts:
+    <cache_folder>/<fingerprint>.json
+Rendering the figures again for unchanged data therefore only reads the results back.
+
+The cache is bounded in size: once it grows beyond max_cache_bytes, the least recently used
+results are removed. Reading a result refreshes its modification time, which serves as the
+time of last use.
+
+Increase cache_version whenever the fitting code changes its results, to invalidate the
+results stored before.
+'''
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+cache_version = 1
+cache_ext = ".json"
+max_cache_bytes = 16 * 1024 * 1024
+
+
+def fingerprint(data, distribution, options=None):
+    '''
+    Hash of the data (an array or a list of arrays), the distribution and the options
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([cache_version, distribution, options or {}], sort_keys=True).encode())
+    for array in (data if isinstance(data, (list, tuple)) else [data]):
+        array = np.ascontiguousarray(array)
+        h.update((str(array.dtype) + str(array.shape)).encode())
+        h.update(array.data)
+    return h.hexdigest()
+
+
+def to_json(value):
+    '''
+    value with the numpy types converted to their json counterparts
+    '''
+    if isinstance(value, dict):
+        return {str(key): to_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [to_json(item) for item in value]
+    if isinstance(value, (np.bool_, bool)):
+        return bool(value)
+    if isinstance(value, (np.integer, int)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return float(value)
+    return value
+
+
+def cache_get(cache_folder, key):
+    '''
+    Result stored for key, None if there is none
+    '''
+    path = os.path.join(cache_folder, key + cache_ext)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            result = json.load(f)
+    except ValueError:
+        return None
+    os.utime(path)
+    return result
+
+
+def evict(cache_folder, max_bytes=max_cache_bytes):
+    '''
+    Remove the least recently used results until the cache is not larger than max_bytes
+    '''
+    entries = []
+    for name in os.listdir(cache_folder):
+        if name.endswith(cache_ext):
+            stat = os.stat(os.path.join(cache_folder, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(cache_folder, name))
+        total -= size
+
+
+def cache_put(cache_folder, key, result, max_bytes=max_cache_bytes):
+    if not os.path.exists(cache_folder):
+        os.makedirs(cache_folder)
+    path = os.path.join(cache_folder, key + cache_ext)
+    with open(path + ".part", "w") as f:
+        json.dump(result, f)
+    os.replace(path + ".part", path)
+    evict(cache_folder, max_bytes)
+
+
+def cached_fit(cache_folder, distribution, data, fit, options=None, max_bytes=max_cache_bytes):
+    '''
+    Result of fit(), read from the cache if the same data has been fitted with the same
+    distribution and options before, otherwise computed and stored
+
+    The result is returned in its json form, i.e. tuples and arrays as lists.
+    '''
+    key = fingerprint(data, distribution, options)
+    result = cache_get(cache_folder, key)
+    if result is None:
+        result = to_json(fit())
+        cache_put(cache_folder, key, result, max_bytes)
+    return result
@@ -0,0 +1,238 @@
+'''
+Discovery of the DWD stations and archives
+
+Instead of maintaining the urls and file names by hand, the directory listings of the
+DWD open data server and the station description files are parsed into a catalog.
+The catalog is indexed by product and station ID, such that any station can be resolved
+to its set of archives in the same format as dwd_data_info. It is cached locally as json
+and only rebuilt once it is older than max_age_days.
+
+The historical archives end with the last quality controlled year. They are continued by
+the "recent" archives (about the last 500 days, updated daily) and, for the 10-minutes
+products, by the "now" archives (the current day, updated several times per hour). Their
+names are fixed per station, e.g. "10minutenwerte_wind_03379_akt.zip", so they are not listed.
+
+Products:
+    "hourly_mean":      hourly mean wind, specifier "ff"
+    "10-minutes_mean":  10-minutes mean wind, specifier "ff"
+    "10-minutes_max":   10-minutes extreme wind, specifier "fx"
+'''
+
+import json
+import os
+import re
+import time
+
+from dwd_data_info import dwd_data_info, stations
+from dwd_download import make_session
+
+base_url = "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/"
+
+products = {
+    "hourly_mean": {
+        "folder": base_url + "hourly/wind/",
+        "archive_prefix": "stundenwerte_FF_",
+        "member_prefix": "produkt_ff_stunde_",
+        "description": "FF_Stundenwerte_Beschreibung_Stationen.txt",
+        "periods": ["recent"]
+    },
+    "10-minutes_mean": {
+        "folder": base_url + "10_minutes/wind/",
+        "archive_prefix": "10minutenwerte_wind_",
+        "member_prefix": "produkt_zehn_min_ff_",
+        "description": "zehn_min_ff_Beschreibung_Stationen.txt",
+        "periods": ["recent", "now"]
+    },
+    "10-minutes_max": {
+        "folder": base_url + "10_minutes/extreme_wind/",
+        "archive_prefix": "10minutenwerte_extrema_wind_",
+        "member_prefix": "produkt_zehn_min_fx_",
+        "description": "zehn_min_fx_Beschreibung_Stationen.txt",
+        "periods": ["recent", "now"]
+    }
+}
+
+# suffix of the archive names of the periods continuing the historical archives
+update_periods = {"recent": "akt", "now": "now"}
+
+# last column of the newer station description files
+access_values = ["Frei", "Kostenpflichtig"]
+
+
+def fetch_listing(session, url):
+    '''
+    File names linked in the html directory listing at url
+    '''
+    response = session.get(url, timeout=(10, 60))
+    response.raise_for_status()
+    return re.findall(r'href="([^"?/]+)"', response.text)
+
+
+def parse_archive_names(names, product):
+    '''
+    Historical archives of product found in the list of file names
+    '''
+    info = products[product]
+    pattern = re.compile(re.escape(info["archive_prefix"]) + r"(\d{5})_(\d{8})_(\d{8})_hist\.zip$")
+    archives = []
+    for name in names:
+        match = pattern.match(name)
+        if match is None:
+            continue
+        station_id, start, end = match.groups()
+        archives.append({
+            "station_id": station_id,
+            "start": start,
+            "end": end,
+            "url": info["folder"] + "historical/" + name,
+            "file_name": info["member_prefix"] + start + "_" + end + "_" + station_id + ".txt"
+        })
+    return archives
+
+
+def parse_station_description(text):
+    '''
+    Stations listed in a "*_Beschreibung_Stationen.txt" file, indexed by station ID
+
+    Stations_id von_datum bis_datum Stationshoehe geoBreite geoLaenge Stationsname Bundesland [Abgabe]
+    '''
+    stations = {}
+    for line in text.splitlines():
+        tokens = line.split()
+        if len(tokens) < 8 or not tokens[0].isdigit():
+            continue
+        rest = tokens[6:]
+        if rest[-1] in access_values:
+            rest = rest[:-1]
+        stations[tokens[0].zfill(5)] = {
+            "from": tokens[1],
+            "to": tokens[2],
+            "height": float(tokens[3]),
+            "lat": float(tokens[4]),
+            "lon": float(tokens[5]),
+            "name": " ".join(rest[:-1]),
+            "state": rest[-1]
+        }
+    return stations
+
+
+def build_catalog(session=None):
+    '''
+    Catalog of all stations and historical archives of all products on the DWD server
+    '''
+    if session is None:
+        session = make_session()
+
+    catalog = {"created": time.time(), "stations": {}, "archives": {}}
+    for product, info in products.items():
+        print("\tListing: " + info["folder"] + "historical/")
+        archives = parse_archive_names(fetch_listing(session, info["folder"] + "historical/"), product)
+
+        response = session.get(info["folder"] + "historical/" + info["description"], timeout=(10, 60))
+        response.raise_for_status()
+        for station_id, station in parse_station_description(response.content.decode("latin-1")).items():
+            catalog["stations"].setdefault(station_id, station)
+
+        index = {}
+        for archive in archives:
+            index.setdefault(archive["station_id"], []).append(archive)
+        for station_archives in index.values():
+            station_archives.sort(key=lambda archive: archive["start"])
+        catalog["archives"][product] = index
+    return catalog
+
+
+def load_catalog(cache_path, max_age_days=7, session=None, offline=False):
+    '''
+    Catalog from the local cache, rebuilt from the DWD server if missing or outdated
+    '''
+    if os.path.exists(cache_path):
+        with open(cache_path, "r") as f:
+            catalog = json.load(f)
+        if offline or time.time() - catalog["created"] < max_age_days * 86400:
+            return catalog
+    elif offline:
+        raise FileNotFoundError("No cached catalog available in offline mode: " + cache_path)
+
+    catalog = build_catalog(session)
+    folder = os.path.dirname(cache_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(cache_path + ".part", "w") as f:
+        json.dump(catalog, f)
+    os.replace(cache_path + ".part", cache_path)
+    return catalog
+
+
+def resolve(catalog, station_id, product):
+    '''
+    Archives of product for station_id, sorted by start date
+    '''
+    return catalog["archives"].get(product, {}).get(station_id.zfill(5), [])
+
+
+def stations_in_state(catalog, state, product="10-minutes_mean"):
+    '''
+    IDs of the stations in the federal state (Bundesland) with archives of product
+    '''
+    return sorted(station_id for station_id in catalog["archives"].get(product, {})
+                  if catalog["stations"].get(station_id, {}).get("state") == state)
+
+
+def data_info(catalog, station_ids, product_names=None):
+    '''
+    Archives of the stations and products in the format of dwd_data_info
+    '''
+    if product_names is None:
+        product_names = list(products)
+
+    info = {}
+    for station_id in station_ids:
+        for product in product_names:
+            for idx, archive in enumerate(resolve(catalog, station_id, product)):
+                info[station_id.zfill(5) + "_" + product + "_" + str(idx + 1)] = {
+                    "url": archive["url"],
+                    "file_name": archive["file_name"],
+                    "station": station_id.zfill(5),
+                    "product": product
+                }
+    return info
+
+
+def station_archives(station_ids, cache_path, offline=False):
+    '''
+    Station IDs and their historical archives in the format of dwd_data_info: resolved from
+    the catalog if station_ids is set, otherwise the city and airport ones of dwd_data_info
+    '''
+    if not station_ids:
+        return list(stations.values()), dwd_data_info
+    catalog = load_catalog(cache_path, offline=offline)
+    station_ids = [station_id.zfill(5) for station_id in station_ids]
+    return station_ids, data_info(catalog, station_ids)
+
+
+def update_info(station_ids, product_names=None, periods=None):
+    '''
+    Recent and now archives of the stations and products in the format of dwd_data_info,
+    with the additional field "period"
+    '''
+    if product_names is None:
+        product_names = list(products)
+    if periods is None:
+        periods = list(update_periods)
+
+    info = {}
+    for station_id in station_ids:
+        station_id = station_id.zfill(5)
+        for product in product_names:
+            for period in products[product]["periods"]:
+                if period not in periods:
+                    continue
+                name = products[product]["archive_prefix"] + station_id + "_" + update_periods[period] + ".zip"
+                info[station_id + "_" + product + "_" + period] = {
+                    "url": products[product]["folder"] + period + "/" + name,
+                    "station": station_id,
+                    "product": product,
+                    "period": period
+                }
+    return info
@@ -0,0 +1,289 @@
+'''
+Persisted count cube of a series, updated incrementally per year
+
+For each (station, product) series of the store, the samples are counted once into
+    counts   (year, month, hour, direction base bin, speed bin)    int32
+together with the running sums per (year, month, hour)
+    samples  number of valid speeds                                 int64
+    sums     sum of the speeds in tenths of m/s                     int64
+    maxima   maximum speed                                          float32
+and the speed histogram in steps of 0.1 m/s
+    histogram (year, month, speed value)                            int32
+and written next to the series as
+    <store_folder>/<station_id>/<product>.cube.npz
+
+Each year slice keeps a hash of the samples it was counted from. When the series changes,
+only the years whose hash differs are counted again; a change of the speed ranges or of the
+direction base edges rebuilds the whole cube.
+
+The tables and histograms for a date window are sums over the year and month axes of the
+cube and do not touch the samples. Windows are made of whole months: start is rounded down and end up to
+the month.
+'''
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from dwd_binning import nr_months, nr_histogram_bins, histogram_resolution, direction_bins, speed_bins
+from dwd_store import open_series
+
+cube_ext = ".cube.npz"
+cube_version = 2
+nr_hours = 24
+
+
+def cube_path(store_folder, station_id, product):
+    return os.path.join(store_folder, station_id, product + cube_ext)
+
+
+def year_slices(minutes):
+    '''
+    Years of the sorted epoch-minutes and the (begin, end) index of each of them
+    '''
+    if len(minutes) == 0:
+        return np.zeros(0, dtype=np.int64), []
+    first = int(np.datetime64(int(minutes[0]), "m").astype("datetime64[Y]").astype("int64"))
+    last = int(np.datetime64(int(minutes[-1]), "m").astype("datetime64[Y]").astype("int64"))
+    bounds = np.arange(first, last + 2).astype("datetime64[Y]").astype("datetime64[m]").astype("int64")
+    idx = np.searchsorted(minutes, bounds, side="left")
+    years = []
+    slices = []
+    for i in range(len(bounds) - 1):
+        if idx[i + 1] > idx[i]:
+            years.append(1970 + first + i)
+            slices.append((int(idx[i]), int(idx[i + 1])))
+    return np.array(years, dtype=np.int64), slices
+
+
+def slice_hash(series, begin, end):
+    '''
+    Hash of the samples of series between begin and end
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    for key in ["minutes", "speed", "direction"]:
+        h.update(np.ascontiguousarray(series[key][begin:end]).data)
+    return h.hexdigest()
+
+
+def count_chunk(minutes, speed, direction, ranges, base_edges):
+    '''
+    Counts and running sums of the samples of one chunk within one year
+    '''
+    nr_dir = len(base_edges)
+    nr_speed = len(ranges) + 1
+
+    minutes = np.asarray(minutes, dtype=np.int64)
+    speed = np.asarray(speed)
+    month = minutes.astype("datetime64[m]").astype("datetime64[M]").astype("int64") % 12
+    hour = (minutes // 60) % nr_hours
+    slot = month * nr_hours + hour
+
+    flat = (slot * nr_dir + direction_bins(direction, base_edges)) * nr_speed + speed_bins(speed, ranges)
+    counts = np.bincount(flat, minlength=nr_months * nr_hours * nr_dir * nr_speed)
+
+    valid = np.isfinite(speed)
+    slot = slot[valid]
+    speed = speed[valid]
+    steps = np.clip(np.rint(speed / histogram_resolution).astype(np.int64), 0, nr_histogram_bins - 1)
+    histogram = np.bincount(month[valid] * nr_histogram_bins + steps, minlength=nr_months * nr_histogram_bins)
+    samples = np.bincount(slot, minlength=nr_months * nr_hours)
+    sums = np.bincount(slot, weights=np.rint(speed * 10), minlength=nr_months * nr_hours)
+    maxima = np.full(nr_months * nr_hours, np.nan, dtype=np.float32)
+    if len(speed):
+        # maximum per slot: the last speed of each slot after sorting by (slot, speed)
+        order = np.lexsort((speed, slot))
+        last = np.append(slot[order][1:] != slot[order][:-1], True)
+        maxima[slot[order][last]] = speed[order][last]
+
+    return {
+        "counts": counts.reshape(nr_months, nr_hours, nr_dir, nr_speed).astype(np.int32),
+        "samples": samples.reshape(nr_months, nr_hours).astype(np.int64),
+        "sums": np.rint(sums).reshape(nr_months, nr_hours).astype(np.int64),
+        "maxima": maxima.reshape(nr_months, nr_hours),
+        "histogram": histogram.reshape(nr_months, nr_histogram_bins).astype(np.int32)
+    }
+
+
+def count_year(minutes, speed, direction, ranges, base_edges, chunk_size=None):
+    '''
+    Counts and running sums of the samples of one year, optionally accumulated over
+    chunks of chunk_size samples, which gives the same result with a bounded memory use
+    '''
+    if chunk_size is None or len(minutes) <= chunk_size:
+        return count_chunk(minutes, speed, direction, ranges, base_edges)
+
+    year = None
+    for begin in range(0, len(minutes), chunk_size):
+        end = begin + chunk_size
+        part = count_chunk(minutes[begin:end], speed[begin:end], direction[begin:end], ranges, base_edges)
+        if year is None:
+            year = part
+            continue
+        year["counts"] += part["counts"]
+        year["samples"] += part["samples"]
+        year["sums"] += part["sums"]
+        year["maxima"] = np.fmax(year["maxima"], part["maxima"])
+        year["histogram"] += part["histogram"]
+    return year
+
+
+def load_cube(path):
+    '''
+    Cube stored at path as dict of arrays, None if there is none
+    '''
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as f:
+        cube = {key: f[key] for key in f.files}
+    if int(cube["version"]) != cube_version:
+        return None
+    return cube
+
+
+def save_cube(cube, path):
+    with open(path + ".part", "wb") as f:
+        np.savez_compressed(f, **cube)
+    os.replace(path + ".part", path)
+
+
+def update_cube(store_folder, station_id, product, ranges, base_edges, chunk_size=None):
+    '''
+    Bring the cube of station_id and product up to date with its series,
+    counting only the years that changed, and return it with the number of years counted
+
+    With chunk_size, the memory-mapped samples are counted in chunks of this many samples.
+    '''
+    ranges = np.asarray(ranges, dtype=np.float64)
+    base_edges = np.asarray(base_edges, dtype=np.float64)
+    path = cube_path(store_folder, station_id, product)
+
+    series = open_series(store_folder, station_id, product)
+    years, slices = year_slices(series["minutes"])
+    hashes = [slice_hash(series, begin, end) for begin, end in slices]
+
+    old = load_cube(path)
+    if old is not None and not (np.array_equal(old["ranges"], ranges) and np.array_equal(old["base_edges"], base_edges)):
+        old = None
+    old_years = {} if old is None else {int(year): i for i, year in enumerate(old["years"])}
+
+    counted = 0
+    parts = {"counts": [], "samples": [], "sums": [], "maxima": [], "histogram": []}
+    for year, (begin, end), year_hash in zip(years, slices, hashes):
+        i = old_years.get(int(year))
+        if i is not None and old["hashes"][i] == year_hash:
+            part = {key: old[key][i] for key in parts}
+        else:
+            part = count_year(series["minutes"][begin:end], series["speed"][begin:end],
+                              series["direction"][begin:end], ranges, base_edges, chunk_size)
+            counted += 1
+        for key in parts:
+            parts[key].append(part[key])
+
+    empty = {
+        "counts": np.zeros((0, nr_months, nr_hours, len(base_edges), len(ranges) + 1), dtype=np.int32),
+        "samples": np.zeros((0, nr_months, nr_hours), dtype=np.int64),
+        "sums": np.zeros((0, nr_months, nr_hours), dtype=np.int64),
+        "maxima": np.zeros((0, nr_months, nr_hours), dtype=np.float32),
+        "histogram": np.zeros((0, nr_months, nr_histogram_bins), dtype=np.int32)
+    }
+    cube = {key: np.stack(parts[key]) if parts[key] else empty[key] for key in parts}
+    cube.update({
+        "version": np.array(cube_version),
+        "years": years,
+        "hashes": np.array(hashes, dtype="U32"),
+        "ranges": ranges,
+        "base_edges": base_edges
+    })
+
+    if counted or old is None or len(old["years"]) != len(years):
+        save_cube(cube, path)
+    return cube, counted
+
+
+def month_bounds(start=None, end=None):
+    '''
+    First and end (exclusive) month of the window as months since 1970, None if open
+    '''
+    first = last = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        first = (start.year - 1970) * nr_months + start.month - 1
+    if end is not None:
+        end = pd.Timestamp(end)
+        last = (end.year - 1970) * nr_months + end.month - 1
+        if end > pd.Timestamp(end.year, end.month, 1):
+            last += 1
+    return first, last
+
+
+def window_mask(cube, start=None, end=None):
+    '''
+    Mask of shape (year, month) selecting the months from start up to end
+    '''
+    month_index = (cube["years"][:, None] - 1970) * nr_months + np.arange(nr_months)[None, :]
+    mask = np.ones(month_index.shape, dtype=bool)
+    first, last = month_bounds(start, end)
+    if first is not None:
+        mask &= month_index >= first
+    if last is not None:
+        mask &= month_index < last
+    return mask
+
+
+def window_speeds(series, start=None, end=None):
+    '''
+    Speeds of the series of open_series within the same months as window_mask
+    '''
+    month_index = series["dates"].astype("datetime64[M]").astype(np.int64)
+    mask = np.ones(len(month_index), dtype=bool)
+    first, last = month_bounds(start, end)
+    if first is not None:
+        mask &= month_index >= first
+    if last is not None:
+        mask &= month_index < last
+    return np.asarray(series["speed"])[mask]
+
+
+def window_counts(cube, start=None, end=None, hours=None):
+    '''
+    Counts per (month, direction base bin, speed bin) within the date window,
+    optionally only of the given hours of the day
+    '''
+    counts = cube["counts"]
+    if hours is not None:
+        counts = counts[:, :, hours]
+    counts = counts.sum(axis=2, dtype=np.int64)
+    return np.einsum("ymds,ym->mds", counts, window_mask(cube, start, end).astype(np.int64))
+
+
+def window_mean(cube, start=None, end=None, hours=None):
+    '''
+    Mean speed per month within the date window
+    '''
+    mask = window_mask(cube, start, end)[:, :, None]
+    samples = cube["samples"] if hours is None else cube["samples"][:, :, hours]
+    sums = cube["sums"] if hours is None else cube["sums"][:, :, hours]
+    samples = (samples * mask).sum(axis=(0, 2))
+    sums = (sums * mask).sum(axis=(0, 2))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / 10 / samples
+
+
+def window_max(cube, start=None, end=None, hours=None):
+    '''
+    Maximum speed per month within the date window
+    '''
+    maxima = cube["maxima"] if hours is None else cube["maxima"][:, :, hours]
+    maxima = np.where(window_mask(cube, start, end)[:, :, None], maxima, np.nan)
+    with np.errstate(invalid="ignore"):
+        return np.fmax.reduce(maxima, axis=(0, 2)) if maxima.size else np.full(nr_months, np.nan)
+
+
+def window_histogram(cube, start=None, end=None):
+    '''
+    Speed histogram within the date window, in steps of 0.1 m/s
+    '''
+    return np.einsum("ymv,ym->v", cube["histogram"], window_mask(cube, start, end).astype(np.int64))
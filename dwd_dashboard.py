@@ -0,0 +1,124 @@
+'''
+Dashboard of the plotly figures in one html page
+
+Instead of one html file per figure, each embedding the whole plotly.js bundle of several
+MB, the figures are written into one page with a tab per group, e.g. per station:
+    <output_folder>/dashboard.html
+    <output_folder>/plotly-<version>.min.js
+The page references the single local copy of plotly.js, written once per plotly version, so
+it opens without any internet access.
+
+The figures are embedded as json blocks which the browser does not evaluate when loading
+the page. The figures of a tab are only parsed and drawn when the tab is opened for the
+first time, so the page opens quickly however many figures it holds.
+'''
+
+import html
+import os
+
+import plotly
+from plotly.offline import get_plotlyjs
+
+page_template = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<script src="__PLOTLYJS__"></script>
+<style>
+body { font-family: sans-serif; margin: 0; }
+h1 { font-size: 1.3em; margin: 0.6em 1em; }
+.tab-buttons { border-bottom: 1px solid #ccc; padding: 0 1em; }
+.tab-button { border: 1px solid #ccc; border-bottom: none; background: #f4f4f4; padding: 0.5em 1em; cursor: pointer; }
+.tab-button.active { background: #fff; font-weight: bold; }
+.tab { display: none; padding: 1em; }
+.figure { width: 100%; height: 500px; margin-bottom: 1em; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<div class="tab-buttons">
+__BUTTONS__
+</div>
+__TABS__
+<script>
+function showTab(name) {
+    document.querySelectorAll(".tab").forEach(function (tab) {
+        tab.style.display = tab.id === "tab-" + name ? "block" : "none";
+    });
+    document.querySelectorAll(".tab-button").forEach(function (button) {
+        button.classList.toggle("active", button.dataset.tab === name);
+    });
+    var tab = document.getElementById("tab-" + name);
+    if (!tab.dataset.rendered) {
+        tab.querySelectorAll(".figure").forEach(function (div) {
+            var figure = JSON.parse(document.getElementById(div.id + "-data").textContent);
+            Plotly.newPlot(div, figure.data, figure.layout, {responsive: true});
+        });
+        tab.dataset.rendered = "1";
+    }
+}
+showTab(__FIRST__);
+</script>
+</body>
+</html>
+"""
+
+
+def plotly_js_name():
+    return "plotly-" + plotly.__version__ + ".min.js"
+
+
+def write_plotly_js(output_folder):
+    '''
+    Local copy of the plotly.js bundle of the installed plotly version, written if missing
+    '''
+    path = os.path.join(output_folder, plotly_js_name())
+    if not os.path.exists(path):
+        with open(path + ".part", "w", encoding="utf-8") as f:
+            f.write(get_plotlyjs())
+        os.replace(path + ".part", path)
+    return path
+
+
+def element_id(*names):
+    return "-".join("".join(c if c.isalnum() else "_" for c in name) for name in names)
+
+
+def dashboard_html(pages, title, js_name):
+    '''
+    Page with a tab per entry of pages, a dict of dicts of plotly figures by name
+    '''
+    buttons = []
+    tabs = []
+    for page, figures in pages.items():
+        tab_id = element_id(page)
+        buttons.append('<button class="tab-button" data-tab="' + tab_id + '" onclick="showTab(\'' + tab_id + '\')">' +
+                       html.escape(page) + '</button>')
+        blocks = ['<div class="tab" id="tab-' + tab_id + '">']
+        for name, figure in figures.items():
+            div_id = element_id(page, name)
+            # the json is not evaluated by the browser until the tab is opened
+            figure_json = figure.to_json().replace("</", "<\\/")
+            blocks.append('<div class="figure" id="' + div_id + '"></div>')
+            blocks.append('<script type="application/json" id="' + div_id + '-data">' + figure_json + '</script>')
+        blocks.append('</div>')
+        tabs.append("\n".join(blocks))
+
+    first = '"' + element_id(next(iter(pages))) + '"' if pages else '""'
+    return (page_template.replace("__TITLE__", html.escape(title)).replace("__PLOTLYJS__", js_name)
+            .replace("__BUTTONS__", "\n".join(buttons)).replace("__FIRST__", first).replace("__TABS__", "\n".join(tabs)))
+
+
+def write_dashboard(pages, output_folder, title="Wind data", name="dashboard"):
+    '''
+    Write the dashboard of the pages and the plotly.js it references, returns its path
+    '''
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    write_plotly_js(output_folder)
+    path = os.path.join(output_folder, name + ".html")
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        f.write(dashboard_html(pages, title, plotly_js_name()))
+    os.replace(path + ".part", path)
+    return path
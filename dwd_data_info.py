@@ -70,103 +70,149 @@ LocationID:
             
 '''
 
+# labels used in the output file names
+stations = {
+    "city": "03379",
+    "airp": "01262"
+}
+
+# NOTE: list station IDs here, e.g. ["03379", "01262"], to resolve their archives from the
+# DWD directory listings (dwd_catalog) in stages 1 and 2 instead of using dwd_data_info below
+station_ids = []
+
 dwd_data_info = {
     # City -> with identifier at end: 03379
     # Hourly
     # From 01.01.1985 to 31.12.2022
     "CityHourlyMean":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/hourly/wind/historical/stundenwerte_FF_03379_19850101_20221231_hist.zip",
-        "file_name": "produkt_ff_stunde_19850101_20221231_03379.txt"
+        "file_name": "produkt_ff_stunde_19850101_20221231_03379.txt",
+        "station": "03379",
+        "product": "hourly_mean"
     },
     # 10-minutes mean
     # From 12.07.1997 to 31.12.1999
     "City10MinMean1":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_03379_19970712_19991231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_19970712_19991231_03379.txt"
+        "file_name": "produkt_zehn_min_ff_19970712_19991231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2000 to 31.12.2009
     "City10MinMean2":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_03379_20000101_20091231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20000101_20091231_03379.txt"
+        "file_name": "produkt_zehn_min_ff_20000101_20091231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2010 to 31.12.2019
     "City10MinMean3":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_03379_20100101_20191231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20100101_20191231_03379.txt"
+        "file_name": "produkt_zehn_min_ff_20100101_20191231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2010 to 31.12.2022
     "City10MinMean4":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_03379_20200101_20221231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20200101_20221231_03379.txt"
+        "file_name": "produkt_zehn_min_ff_20200101_20221231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_mean"
     },
     # 10-minutes extreme
     # From 12.07.1997 to 31.12.1999
     "City10MinMax1":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_03379_19970712_19991231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_19970712_19991231_03379.txt"
+        "file_name": "produkt_zehn_min_fx_19970712_19991231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_max"
     },
     # From 01.01.2000 to 31.12.2009
     "City10MinMax2":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_03379_20000101_20091231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20000101_20091231_03379.txt"
+        "file_name": "produkt_zehn_min_fx_20000101_20091231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_max"
     },
     # From 01.01.2010 to 31.12.2019
     "City10MinMax3":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_03379_20100101_20191231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20100101_20191231_03379.txt"
+        "file_name": "produkt_zehn_min_fx_20100101_20191231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_max"
     },
     # From 01.01.2010 to 31.12.2022
     "City10MinMax4":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_03379_20200101_20221231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20200101_20221231_03379.txt"
+        "file_name": "produkt_zehn_min_fx_20200101_20221231_03379.txt",
+        "station": "03379",
+        "product": "10-minutes_max"
     },
     # Airport -> with identifier at end: 01262
     # Hourly
     # From 19.05.1992 to 31.12.2022
     "AirpHourlyMean":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/hourly/wind/historical/stundenwerte_FF_01262_19920519_20221231_hist.zip",
-        "file_name": "produkt_ff_stunde_19920519_20221231_01262.txt"
+        "file_name": "produkt_ff_stunde_19920519_20221231_01262.txt",
+        "station": "01262",
+        "product": "hourly_mean"
     },
     # 10-minutes mean
     # From 20.05.1992 to 31.12.1999
     "Airp10MinMean1":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_01262_19920520_19991231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_19920520_19991231_01262.txt"
+        "file_name": "produkt_zehn_min_ff_19920520_19991231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2000 to 31.12.2009
     "Airp10MinMean2":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_01262_20000101_20091231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20000101_20091231_01262.txt"
+        "file_name": "produkt_zehn_min_ff_20000101_20091231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2010 to 31.12.2019
     "Airp10MinMean3":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_01262_20100101_20191231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20100101_20191231_01262.txt"
+        "file_name": "produkt_zehn_min_ff_20100101_20191231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_mean"
     },
     # From 01.01.2020 to 31.12.2022
     "Airp10MinMean4":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/wind/historical/10minutenwerte_wind_01262_20200101_20221231_hist.zip",
-        "file_name": "produkt_zehn_min_ff_20200101_20221231_01262.txt"
+        "file_name": "produkt_zehn_min_ff_20200101_20221231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_mean"
     },
     # 10-minutes extreme
     # From 20.05.1992 to 31.12.1999
     "Airp10MinMax1":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_01262_19920520_19991231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_19920520_19991231_01262.txt"
+        "file_name": "produkt_zehn_min_fx_19920520_19991231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_max"
     },
     # From 01.01.2000 to 31.12.2009
     "Airp10MinMax2":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_01262_20000101_20091231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20000101_20091231_01262.txt"
+        "file_name": "produkt_zehn_min_fx_20000101_20091231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_max"
     },
     # From 01.01.2010 to 31.12.2019
     "Airp10MinMax3":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_01262_20100101_20191231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20100101_20191231_01262.txt"
+        "file_name": "produkt_zehn_min_fx_20100101_20191231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_max"
     },
     # From 01.01.2020 to 31.12.2022
     "Airp10MinMax4":{
         "url": "https://opendata.dwd.de/climate_environment/CDC/observations_germany/climate/10_minutes/extreme_wind/historical/10minutenwerte_extrema_wind_01262_20200101_20221231_hist.zip",
-        "file_name": "produkt_zehn_min_fx_20200101_20221231_01262.txt"
+        "file_name": "produkt_zehn_min_fx_20200101_20221231_01262.txt",
+        "station": "01262",
+        "product": "10-minutes_max"
     }
 }
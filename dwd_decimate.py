@@ -0,0 +1,61 @@
+'''
+Decimation of long time series for plotting
+
+A line plot of decades of 10-minute samples draws millions of vertices on a few hundred pixel
+columns. The time axis is split into nr_columns equal columns, e.g. the pixel width of the
+axes, and only the minimum and the maximum sample of each column are kept, in their order in
+time. The drawn line then covers the same pixels as the full series, including every peak,
+with at most two points per column.
+
+Columns without samples break the line (a NaN point), such that gaps in the records are
+not bridged by a straight line.
+'''
+
+import numpy as np
+
+
+def column_extremes(columns, values):
+    '''
+    Positions of the first minimum and the first maximum within each run of equal columns
+    '''
+    new = np.concatenate([[True], columns[1:] != columns[:-1]])
+    starts = np.flatnonzero(new)
+    run = np.cumsum(new) - 1
+    positions = []
+    for reduce in [np.fmin, np.fmax]:
+        extremes = reduce.reduceat(values, starts)
+        at_extreme = np.flatnonzero(values == extremes[run])
+        positions.append(at_extreme[np.concatenate([[True], np.diff(run[at_extreme]) > 0])])
+    return starts, positions[0], positions[1]
+
+
+def minmax_decimate(dates, values, nr_columns=1000):
+    '''
+    Minimum and maximum of each of nr_columns time columns, from the dates sorted in
+    ascending order, as (dates, values) with NaN values breaking the line at empty columns
+    '''
+    dates = np.asarray(dates).astype("datetime64[m]")
+    values = np.asarray(values, dtype=np.float64)
+    valid = np.isfinite(values)
+    dates, values = dates[valid], values[valid]
+    if len(values) <= 2 * nr_columns:
+        return dates, values
+
+    minutes = dates.astype(np.int64)
+    first, last = minutes[0], minutes[-1]
+    columns = (minutes - first) * nr_columns // (last - first + 1)
+    starts, at_min, at_max = column_extremes(columns, values)
+
+    # the minimum and maximum of each column in their order in time, once if they coincide
+    keep = np.unique(np.concatenate([at_min, at_max]))
+
+    # a break after each column followed by an empty one
+    used = columns[starts]
+    gaps = np.flatnonzero(np.diff(used) > 1)
+    last_of_column = np.append(starts[1:], len(values)) - 1
+    breaks = last_of_column[gaps]
+    keep_breaks = np.searchsorted(keep, breaks, side="right")
+
+    out_dates = np.insert(dates[keep], keep_breaks, dates[breaks])
+    out_values = np.insert(values[keep], keep_breaks, np.nan)
+    return out_dates, out_values
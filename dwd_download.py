@@ -0,0 +1,370 @@
+'''
+Download helpers for the DWD open data server
+
+All archives are fetched through one shared requests.Session, whose connection pool
+keeps the connections to opendata.dwd.de alive between files. Several files are
+requested concurrently by a bounded pool of worker threads, such that the total time
+is limited by the available bandwidth rather than by the latency of each round trip.
+
+The response bodies are streamed in chunks directly to the archive files on disk, so the
+memory needed does not depend on the number or the size of the archives.
+
+The archive folder acts as a download cache. A manifest records ETag, Last-Modified,
+size and SHA-256 of every archive per dwd_data_info entry. Archives already in the cache
+are only requested conditionally and are not transferred again if unchanged on the server.
+In offline mode no request is made at all and only the cached archives are used.
+
+Interrupted transfers are resumed with HTTP Range requests and retried with exponential
+backoff. An archive only counts as downloaded once it is complete and its CRC-32 checks pass.
+Any other request error fails only its archive. The manifest is saved after every archive
+downloaded, so an aborted run keeps the archives completed before.
+'''
+
+import hashlib
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+manifest_name = "manifest.json"
+
+status_messages = {
+    404: "File not found",
+    503: "Service unavailable",
+    401: "Unauthorised (Authentication required)",
+    403: "Forbidden"
+}
+
+
+def make_session(pool_size=8):
+    '''
+    Session with a keep-alive connection pool large enough for pool_size parallel workers
+    '''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def archive_path(archive_folder, url):
+    '''
+    Local path of the archive belonging to url
+    '''
+    return os.path.join(archive_folder, url.split("/")[-1])
+
+
+def load_manifest(archive_folder):
+    path = os.path.join(archive_folder, manifest_name)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(archive_folder, manifest):
+    path = os.path.join(archive_folder, manifest_name)
+    with open(path + ".part", "w") as f:
+        json.dump(manifest, f, indent=4, sort_keys=True)
+    os.replace(path + ".part", path)
+
+
+def is_cached(entry, target_path):
+    '''
+    Check if the manifest entry is matched by the archive file on disk
+    '''
+    return (entry is not None
+            and os.path.exists(target_path)
+            and os.path.getsize(target_path) == entry["size"])
+
+
+def verify_archive(path):
+    '''
+    Check that path is a complete zip archive whose members all match their CRC-32
+    '''
+    try:
+        with zipfile.ZipFile(path) as z:
+            return z.testzip() is None
+    except (zipfile.BadZipFile, OSError, EOFError):
+        return False
+
+
+def file_sha256(path, chunk_size=1024*1024):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def load_validator(part_path):
+    '''
+    ETag and Last-Modified of the transfer a ".part" file belongs to, if any
+    '''
+    if not (os.path.exists(part_path) and os.path.exists(part_path + ".json")):
+        return None
+    with open(part_path + ".json", "r") as f:
+        return json.load(f)
+
+
+def save_validator(part_path, response):
+    with open(part_path + ".json", "w") as f:
+        json.dump({"etag": response.headers.get("ETag"),
+                   "last_modified": response.headers.get("Last-Modified")}, f)
+
+
+def remove_part(part_path):
+    for path in [part_path, part_path + ".json"]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def transfer(session, url, part_path, headers, timeout, chunk_size):
+    '''
+    One attempt at streaming url into part_path, resuming a partial transfer with an
+    HTTP Range request if possible
+
+    Returns the status code, the number of bytes received and the expected total size.
+    '''
+    headers = dict(headers)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = load_validator(part_path)
+    if offset > 0 and validator is not None and (validator["etag"] or validator["last_modified"]):
+        headers["Range"] = "bytes=" + str(offset) + "-"
+        # the server only honours the range if the file is still the one of the partial transfer
+        headers["If-Range"] = validator["etag"] or validator["last_modified"]
+    else:
+        offset = 0
+
+    received = 0
+    with session.get(url, headers=headers, stream=True, timeout=timeout) as response:
+        status_code = response.status_code
+        if status_code == 206:
+            content_range = response.headers.get("Content-Range", "")
+            if not content_range.startswith("bytes " + str(offset) + "-"):
+                raise IOError("Unexpected Content-Range: " + content_range)
+            mode = "ab"
+            expected = int(content_range.split("/")[-1])
+        elif status_code == 200:
+            mode = "wb"
+            offset = 0
+            expected = response.headers.get("Content-Length")
+            expected = int(expected) if expected is not None else None
+            save_validator(part_path, response)
+        else:
+            return status_code, 0, None, None
+
+        with open(part_path, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                received += len(chunk)
+
+        entry = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+        if status_code == 206:
+            validator = load_validator(part_path)
+            entry["etag"] = entry["etag"] or validator["etag"]
+            entry["last_modified"] = entry["last_modified"] or validator["last_modified"]
+
+    return status_code, received, expected, entry
+
+
+def download(session, url, target_path, entry=None, chunk_size=64*1024,
+             max_retries=5, backoff_factor=1.0, timeout=(10, 60)):
+    '''
+    Stream a single url to target_path, returns a dict with the transfer statistics
+
+    If entry is the manifest entry of a cached archive, the request is made conditional
+    on its ETag and Last-Modified and the archive is kept as it is if the server replies
+    with 304 Not Modified. The body is spooled to a temporary ".part" file, which only
+    replaces target_path once the transfer is complete and the zip archive passed its
+    CRC check. Dropped connections and server errors are retried up to max_retries times
+    with exponential backoff, resuming the ".part" file where the previous attempt stopped.
+    Other request errors, e.g. an invalid url or too many redirects, are not retried and
+    returned as "error" of the result.
+    '''
+    headers = {}
+    cached = is_cached(entry, target_path) and entry["url"] == url
+    if cached:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    part_path = target_path + ".part"
+    start = time.perf_counter()
+    size = 0
+    status = "error"
+    status_code = None
+    error = None
+    for attempt in range(max_retries + 1):
+        if attempt > 0:
+            time.sleep(backoff_factor * 2 ** (attempt - 1))
+        try:
+            result = transfer(session, url, part_path, headers, timeout, chunk_size)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.Timeout) as e:
+            error = type(e).__name__ + ": " + str(e)
+            print_failed_attempt(attempt, max_retries, url, str(e))
+            continue
+        except requests.exceptions.RequestException as e:
+            # a subclass of IOError as well, but not resolved by retrying
+            error = type(e).__name__ + ": " + str(e)
+            break
+        except IOError as e:
+            error = type(e).__name__ + ": " + str(e)
+            print_failed_attempt(attempt, max_retries, url, str(e))
+            continue
+
+        status_code = result[0]
+        size += result[1]
+        error = None
+        if status_code == 304 and cached:
+            status = "unchanged"
+            break
+        elif status_code in [200, 206]:
+            expected = result[2]
+            if expected is not None and os.path.getsize(part_path) < expected:
+                print_failed_attempt(attempt, max_retries, url, "incomplete transfer")
+                continue
+            if not verify_archive(part_path):
+                print_failed_attempt(attempt, max_retries, url, "corrupt archive")
+                remove_part(part_path)
+                continue
+            entry = result[3]
+            entry["size"] = os.path.getsize(part_path)
+            entry["sha256"] = file_sha256(part_path)
+            os.replace(part_path, target_path)
+            remove_part(part_path)
+            status = "downloaded"
+            break
+        elif status_code == 416:
+            # the partial file does not fit the archive on the server anymore
+            print_failed_attempt(attempt, max_retries, url, "range not satisfiable")
+            remove_part(part_path)
+        elif status_code in [429, 500, 502, 503, 504]:
+            print_failed_attempt(attempt, max_retries, url, "status " + str(status_code))
+        else:
+            break
+    duration = time.perf_counter() - start
+
+    return {
+        "url": url,
+        "path": target_path,
+        "status": status,
+        "status_code": status_code,
+        "error": error,
+        "entry": entry,
+        "size": size,
+        "duration": duration
+    }
+
+
+def from_cache(url, target_path, entry):
+    '''
+    Result for an archive taken from the cache without any request (offline mode)
+    '''
+    cached = is_cached(entry, target_path) and entry["url"] == url
+    return {
+        "url": url,
+        "path": target_path,
+        "status": "offline" if cached else "error",
+        "status_code": None,
+        "error": None,
+        "entry": entry,
+        "size": 0,
+        "duration": 0.0
+    }
+
+
+def download_all(data_info, archive_folder, max_workers=8, session=None, offline=False,
+                 max_retries=5, backoff_factor=1.0):
+    '''
+    Stream all urls of data_info concurrently into archive_folder with at most
+    max_workers requests in flight, skipping the archives unchanged since the last run
+
+    Returns a dict of results with the same keys as data_info, as well as the total statistics.
+    '''
+    if not os.path.exists(archive_folder):
+        os.makedirs(archive_folder)
+
+    manifest = load_manifest(archive_folder)
+
+    results = dict.fromkeys(data_info)
+    start = time.perf_counter()
+    if offline:
+        for key, info in data_info.items():
+            results[key] = from_cache(info["url"], archive_path(archive_folder, info["url"]), manifest.get(key))
+            print_result(results[key])
+    else:
+        if session is None:
+            session = make_session(max_workers)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(download, session, info["url"],
+                                       archive_path(archive_folder, info["url"]),
+                                       manifest.get(key),
+                                       max_retries=max_retries,
+                                       backoff_factor=backoff_factor): key
+                       for key, info in data_info.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                results[key] = future.result()
+                if results[key]["status"] == "downloaded":
+                    # saved right away, such that an aborted run keeps the completed archives
+                    manifest[key] = results[key]["entry"]
+                    save_manifest(archive_folder, manifest)
+                print_result(results[key])
+    duration = time.perf_counter() - start
+
+    total = {
+        "size": sum(r["size"] for r in results.values()),
+        "duration": duration
+    }
+    return results, total
+
+
+def throughput(size, duration):
+    '''
+    Throughput in MB/s
+    '''
+    return size / 1e6 / max(duration, 1e-9)
+
+
+def print_result(result):
+    if result["status"] == "downloaded":
+        print("\tDownload successful for: " + result["url"] +
+              " ({:.2f} MB in {:.2f} s, {:.2f} MB/s)".format(result["size"] / 1e6,
+                                                              result["duration"],
+                                                              throughput(result["size"], result["duration"])))
+    elif result["status"] == "unchanged":
+        print("\tUnchanged, using cached file for: " + result["url"])
+    elif result["status"] == "offline":
+        print("\tOffline, using cached file for: " + result["url"])
+    elif result["error"] is not None:
+        print("\tError: " + result["error"] + " for: " + result["url"])
+    elif result["status_code"] is None:
+        print("\tError: Not in cache for: " + result["url"])
+    elif result["status_code"] in status_messages:
+        print("\tError: " + status_messages[result["status_code"]] + " for: " + result["url"])
+    else:
+        print("\tDownload failed for: " + result["url"])
+
+
+def print_failed_attempt(attempt, max_retries, url, reason):
+    print("\tAttempt " + str(attempt + 1) + "/" + str(max_retries + 1) + " failed (" + reason + ") for: " + url)
+
+
+def print_total(total, errorcount):
+    print("Request terminated with", errorcount, "errors.")
+    print("Downloaded {:.2f} MB in {:.2f} s ({:.2f} MB/s)".format(total["size"] / 1e6,
+                                                                  total["duration"],
+                                                                  throughput(total["size"], total["duration"])))
@@ -0,0 +1,159 @@
+'''
+Export of the plotly figures
+
+The figures of a script are collected by name and exported together:
+    <output_folder>/<name>.<format>
+A figure is only written again if its fingerprint changed since the last export, or one of
+its files is missing. The fingerprint is the hash of the figure as json, i.e. its data and
+its style, the formats and the plotly version. The fingerprints of the figures written are
+kept in <output_folder>/export_manifest.json, so an export of unchanged figures only
+compares hashes.
+
+The html files are written in this process. The static images are the slow part: they are
+split into one batch per worker process, and each worker renders its batch in one call of
+plotly.io.write_images (plotly 6.1 and later with kaleido 1), reusing one renderer for
+all images. With older versions the images of a batch are written one after the other by
+plotly.io.write_image, which also keeps its renderer alive within the worker.
+
+A failing batch does not stop the export, its figures are reported with the error and
+written again in the next run.
+'''
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+import plotly.io as pio
+
+manifest_name = "export_manifest.json"
+default_formats = ["html", "png", "svg"]
+static_formats = ["png", "svg", "pdf", "jpg", "jpeg", "webp"]
+
+
+def figure_fingerprint(figure_json, formats):
+    '''
+    Hash of the figure as json, the formats and the plotly version
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([plotly.__version__, list(formats)]).encode())
+    h.update(figure_json.encode())
+    return h.hexdigest()
+
+
+def figure_paths(output_folder, name, formats):
+    return {fmt: os.path.join(output_folder, name + "." + fmt) for fmt in formats}
+
+
+def load_manifest(output_folder):
+    path = os.path.join(output_folder, manifest_name)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def save_manifest(output_folder, manifest):
+    path = os.path.join(output_folder, manifest_name)
+    with open(path + ".part", "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(path + ".part", path)
+
+
+def write_static(jobs):
+    '''
+    Write the static images of the jobs, each a (figure json, paths) pair, in one batch
+    '''
+    figures, paths = [], []
+    for figure_json, image_paths in jobs:
+        figure = pio.from_json(figure_json, skip_invalid=True)
+        figures.extend([figure] * len(image_paths))
+        paths.extend(image_paths)
+    if hasattr(pio, "write_images"):
+        pio.write_images(figures, paths)
+    else:
+        for figure, path in zip(figures, paths):
+            pio.write_image(figure, path)
+
+
+def write_batch(jobs):
+    '''
+    write_static for a worker process, returns None or the error message
+    '''
+    try:
+        write_static(jobs)
+        return None
+    except Exception as e:
+        return type(e).__name__ + ": " + str(e)
+
+
+def export_figures(figures, output_folder, formats=default_formats, max_workers=None, force=False):
+    '''
+    Export the figures, a dict of plotly figures by name, in the formats
+
+    Unchanged figures are skipped unless force is True. max_workers is the number of
+    processes of the static export, None for the number of cores, 1 to export in this
+    process. Returns the status of each figure: "unchanged", "written" or the error.
+    '''
+    if not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+    manifest = load_manifest(output_folder)
+
+    status = {}
+    pending = {}
+    for name, figure in figures.items():
+        figure_json = figure.to_json()
+        fingerprint = figure_fingerprint(figure_json, formats)
+        paths = figure_paths(output_folder, name, formats)
+        if not force and manifest.get(name) == fingerprint and all(os.path.exists(path) for path in paths.values()):
+            status[name] = "unchanged"
+        else:
+            pending[name] = (figure, figure_json, fingerprint, paths)
+
+    for name, (figure, _, _, paths) in pending.items():
+        if "html" in paths:
+            figure.write_html(paths["html"])
+
+    # one job per figure, the figures dealt round-robin to the batches
+    jobs = {name: (figure_json, [path for fmt, path in paths.items() if fmt in static_formats])
+            for name, (_, figure_json, _, paths) in pending.items()}
+    names = [name for name, (_, paths) in jobs.items() if paths]
+    nr_batches = min(len(names), max_workers or os.cpu_count() or 1)
+    batch_names = [names[i::nr_batches] for i in range(nr_batches)]
+    batches = [[jobs[name] for name in group] for group in batch_names]
+
+    if nr_batches <= 1:
+        errors = [write_batch(batch) for batch in batches]
+    else:
+        with ProcessPoolExecutor(max_workers=nr_batches) as executor:
+            errors = list(executor.map(write_batch, batches))
+
+    failed = {name: error for group, error in zip(batch_names, errors) if error for name in group}
+    for name, (_, _, fingerprint, _) in pending.items():
+        if name in failed:
+            status[name] = failed[name]
+            manifest.pop(name, None)
+        else:
+            status[name] = "written"
+            manifest[name] = fingerprint
+    save_manifest(output_folder, manifest)
+    return status
+
+
+def print_export(status):
+    '''
+    Number of figures written and unchanged, and the figures failed per error
+    '''
+    written = sum(value == "written" for value in status.values())
+    unchanged = sum(value == "unchanged" for value in status.values())
+    print("\t" + str(written) + " figures written, " + str(unchanged) + " unchanged")
+    errors = {}
+    for name, value in status.items():
+        if value not in ["written", "unchanged"]:
+            errors.setdefault(" ".join(value.split()), []).append(name)
+    for error, names in errors.items():
+        print("\t" + str(len(names)) + " figures failed (" + ", ".join(names) + "): " + error)
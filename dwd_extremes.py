@@ -0,0 +1,146 @@
+'''
+Extreme value analysis of the wind speeds by block maxima
+
+Return levels describe the largest value per year, so the distributions are fitted to the
+maxima of the blocks (years or seasons), not to the individual 10-minutes samples. The
+block maxima of a series sorted in time are extracted in one pass: the dates are turned
+into block numbers and the maxima taken with np.fmax.reduceat at the block starts.
+
+Blocks:
+    "year":     calendar years
+    "season":   meteorological seasons DJF, MAM, JJA and SON, where December belongs to
+                the winter of the following year
+
+Blocks with less than min_coverage of the expected number of samples, e.g. a station
+starting in July, are dropped as their maximum would be biased low.
+
+Distributions:
+    "genextreme"    GEV, fitted by maximum likelihood (scipy convention, c = -xi)
+    "gumbel_r"      Gumbel, fitted by maximum likelihood or by L-moments
+
+The return level for a return period of T blocks is the quantile 1 - 1/T of the fitted
+distribution, e.g. the 50-year gust for annual blocks and T = 50.
+'''
+
+import numpy as np
+from scipy import stats
+
+season_names = ["DJF", "MAM", "JJA", "SON"]
+euler_gamma = 0.5772156649015329
+
+
+def block_numbers(dates, block="year"):
+    '''
+    Block of each date: years since 1970 for "year", seasons since DJF 1970 for "season"
+    '''
+    months = np.asarray(dates).astype("datetime64[M]").astype(np.int64)
+    if block == "year":
+        return months // 12
+    if block == "season":
+        return (months + 1) // 3
+    raise ValueError("Unknown block: " + str(block))
+
+
+def block_bounds(numbers, block="year"):
+    '''
+    Start and end of the blocks as datetime64[m]
+    '''
+    if block == "year":
+        start = numbers * 12
+        end = start + 12
+    else:
+        start = numbers * 3 - 1
+        end = start + 3
+    return start.astype("datetime64[M]").astype("datetime64[m]"), end.astype("datetime64[M]").astype("datetime64[m]")
+
+
+def block_labels(numbers, block="year"):
+    '''
+    Year of each block, and its season for seasonal blocks
+    '''
+    if block == "year":
+        return {"year": numbers + 1970}
+    return {"year": numbers // 4 + 1970, "season": np.array(season_names)[numbers % 4]}
+
+
+def block_maxima(dates, values, block="year", min_coverage=0.8, interval=None):
+    '''
+    Maxima of values per block, from the dates sorted in ascending order
+
+    interval is the sampling interval in minutes, inferred from the dates if not given.
+    Returns a dict with "maxima", "coverage" and the labels of the blocks kept.
+    '''
+    dates = np.asarray(dates).astype("datetime64[m]")
+    values = np.asarray(values, dtype=np.float64)
+    numbers = block_numbers(dates, block)
+
+    starts = np.flatnonzero(np.concatenate([[True], numbers[1:] != numbers[:-1]]))
+    maxima = np.fmax.reduceat(values, starts)
+    counts = np.diff(np.append(starts, len(values)))
+    numbers = numbers[starts]
+
+    if interval is None:
+        interval = float(np.median(np.diff(dates.astype(np.int64)))) if len(dates) > 1 else 10.0
+    begin, end = block_bounds(numbers, block)
+    coverage = counts * interval / (end - begin).astype(np.int64)
+
+    keep = (coverage >= min_coverage) & np.isfinite(maxima)
+    result = {"maxima": maxima[keep], "coverage": coverage[keep], "block": block}
+    result.update({key: labels[keep] for key, labels in block_labels(numbers, block).items()})
+    return result
+
+
+def select_season(result, season):
+    '''
+    Seasonal block maxima of one season only, e.g. "DJF"
+    '''
+    keep = result["season"] == season
+    return {key: (value[keep] if isinstance(value, np.ndarray) else value) for key, value in result.items()}
+
+
+def lmoments(values):
+    '''
+    First two sample L-moments
+    '''
+    x = np.sort(np.asarray(values, dtype=np.float64))
+    n = len(x)
+    b0 = x.mean()
+    b1 = (np.arange(n) * x).sum() / (n * (n - 1))
+    return b0, 2 * b1 - b0
+
+
+def fit_gumbel_lmoments(values):
+    '''
+    Location and scale of the Gumbel distribution from the L-moments
+    '''
+    l1, l2 = lmoments(values)
+    scale = l2 / np.log(2)
+    return l1 - euler_gamma * scale, scale
+
+
+def fit_extremes(maxima, distribution="genextreme", method="mle"):
+    '''
+    Fit of the distribution to the block maxima, as dict with "distribution", "params"
+    in the order of scipy.stats, "method" and the number of maxima "n"
+    '''
+    maxima = np.asarray(maxima, dtype=np.float64)
+    if distribution == "gumbel_r" and method == "lmoments":
+        params = fit_gumbel_lmoments(maxima)
+    elif method == "mle":
+        params = getattr(stats, distribution).fit(maxima)
+    else:
+        raise ValueError("Unknown method " + str(method) + " for " + str(distribution))
+    return {"distribution": distribution, "params": [float(param) for param in params], "method": method,
+            "n": len(maxima)}
+
+
+def return_levels(fit, periods):
+    '''
+    Values exceeded on average once in the given return periods, in blocks
+    '''
+    periods = np.asarray(periods, dtype=np.float64)
+    return getattr(stats, fit["distribution"]).ppf(1 - 1 / periods, *fit["params"])
+
+
+def fit_pdf(fit, x):
+    return getattr(stats, fit["distribution"]).pdf(x, *fit["params"])
@@ -0,0 +1,256 @@
+'''
+Weibull fits of the wind speed distribution from binned counts
+
+The speeds are recorded in steps of 0.1 m/s, so the histogram of these values holds all the
+information of the samples. The two-parameter Weibull distribution (location 0) is fitted by
+maximizing the likelihood of the binned counts
+    L = sum_i n_i * log(F(b_i) - F(a_i)),    F(x) = 1 - exp(-(x / scale)^shape)
+over the bins [a_i, b_i), which only takes a few hundred terms instead of millions of samples.
+Calm samples (0 m/s) are handled by their bin [0, 0.05), i.e. as left-censored at 0.05 m/s,
+and need no special treatment. Their share of all samples is reported as "calm_share".
+
+The optimization starts from the method of moments, the least-squares fit of the Weibull
+plot ln(-ln(1 - F)) = shape * ln(x) - shape * ln(scale) is given for comparison. The mean
+log-likelihood per sample is optimized, such that the tolerances do not depend on the number
+of samples. The fit is deterministic: the same counts always give the same parameters.
+
+Goodness of fit:
+    ks      largest distance between the empirical and the fitted distribution function
+    chi2    chi-square statistic over the bins with at least 5 expected samples, the rest of
+            the upper tail pooled into one bin, with its degrees of freedom and p-value
+
+Optionally the fit is checked against the exact maximum likelihood fit of the same samples:
+the density of each sample, with the calm samples left-censored as in the binned fit. The
+deviations then only come from the binning of the speeds above the calm bin.
+
+Stage 3 exports the histograms and fits as compact tables, so that the plots draw bars
+and curves of a few dozen rows regardless of the length of the records:
+    histogram   bin edges, counts and probability density, in bins of binwidth
+    curve       density of the fitted distribution over the range of the samples
+    fits        parameters and goodness of fit of all fits in one table
+'''
+
+import numpy as np
+import pandas as pd
+from scipy import optimize, special, stats
+
+from dwd_binning import histogram_edges, histogram_resolution, rebin_histogram, histogram_frame
+from dwd_cube import window_histogram
+
+
+def weibull_cdf(x, shape, scale):
+    return -np.expm1(-(np.asarray(x, dtype=np.float64) / scale) ** shape)
+
+
+def bin_centers(edges):
+    '''
+    Centers of the bins, the open last bin is represented by its lower edge
+    '''
+    upper = np.where(np.isfinite(edges[1:]), edges[1:], edges[:-1])
+    return (edges[:-1] + upper) / 2
+
+
+def weibull_moments(edges, counts):
+    '''
+    Shape and scale from the mean and standard deviation of the binned samples
+    '''
+    x = bin_centers(edges)
+    n = counts.sum()
+    mean = (counts * x).sum() / n
+    std = np.sqrt((counts * (x - mean) ** 2).sum() / n)
+    # approximation of Justus et al. for the shape from the coefficient of variation
+    shape = (std / mean) ** -1.086
+    scale = mean / special.gamma(1 + 1 / shape)
+    return shape, scale
+
+
+def weibull_least_squares(edges, counts):
+    '''
+    Shape and scale from the straight line fit of the Weibull plot of the binned samples
+    '''
+    cdf = np.cumsum(counts)[:-1] / counts.sum()
+    x = edges[1:-1]
+    valid = (cdf > 0) & (cdf < 1) & (x > 0)
+    slope, intercept = np.polyfit(np.log(x[valid]), np.log(-np.log1p(-cdf[valid])), 1)
+    return slope, np.exp(-intercept / slope)
+
+
+def binned_loglik(params, edges, counts):
+    '''
+    Log-likelihood of the binned counts, params being (log shape, log scale)
+    '''
+    shape, scale = np.exp(params)
+    probs = np.diff(weibull_cdf(edges, shape, scale))
+    return (counts * np.log(np.maximum(probs, 1e-300))).sum()
+
+
+def goodness_of_fit(edges, counts, shape, scale, nr_params=2):
+    '''
+    Kolmogorov-Smirnov distance and chi-square test of the fitted distribution
+    '''
+    n = counts.sum()
+    cdf = weibull_cdf(edges[1:], shape, scale)
+    ks = np.max(np.abs(np.cumsum(counts) / n - cdf))
+
+    expected = n * np.diff(weibull_cdf(edges, shape, scale))
+    # pooling the upper tail once less than 5 samples are expected per bin
+    last = len(expected) - 1
+    while last > 0 and expected[last - 1] < 5:
+        last -= 1
+    observed = np.append(counts[:last], counts[last:].sum())
+    expected = np.append(expected[:last], expected[last:].sum())
+    keep = expected > 0
+    chi2 = (((observed - expected) ** 2)[keep] / expected[keep]).sum()
+    dof = max(int(keep.sum()) - 1 - nr_params, 1)
+    return {"ks": ks, "chi2": chi2, "dof": dof, "p_value": stats.chi2.sf(chi2, dof)}
+
+
+def exact_loglik(params, values, counts, calm, nr_calms):
+    '''
+    Log-likelihood of the samples, given as distinct values with their counts, and of the
+    calm samples left-censored at calm, params being (log shape, log scale)
+    '''
+    shape, scale = np.exp(params)
+    z = values / scale
+    log_pdf = np.log(shape / scale) + (shape - 1) * np.log(z) - z ** shape
+    return (counts * log_pdf).sum() + nr_calms * np.log(max(weibull_cdf(calm, shape, scale), 1e-300))
+
+
+def exact_fit(samples, start, calm=histogram_resolution / 2):
+    '''
+    Shape and scale of the exact maximum likelihood fit of the samples, the samples below
+    calm being left-censored, started from start
+
+    The recorded speeds take few distinct values, so the density is evaluated once per value.
+    '''
+    samples = np.asarray(samples, dtype=np.float64)
+    samples = samples[np.isfinite(samples)]
+    values, counts = np.unique(samples[samples >= calm], return_counts=True)
+    nr_calms = int((samples < calm).sum())
+    n = len(samples)
+    result = optimize.minimize(lambda params: -exact_loglik(params, values, counts, calm, nr_calms) / n, np.log(start),
+                               method="Nelder-Mead", options={"xatol": 1e-8, "fatol": 1e-10, "maxiter": 2000})
+    shape, scale = np.exp(result.x)
+    return shape, scale
+
+
+def empty_fit():
+    '''
+    Fit of a histogram without samples, all values NaN
+    '''
+    fit = dict.fromkeys(["shape", "scale", "calm_share", "loglik", "ks", "chi2", "dof", "p_value"], np.nan)
+    fit.update({"loc": 0.0, "n": 0, "moments": (np.nan, np.nan), "least_squares": (np.nan, np.nan), "converged": False})
+    return fit
+
+
+def fit_weibull(counts, edges=None, samples=None):
+    '''
+    Binned maximum likelihood Weibull fit of the histogram counts
+
+    edges default to those of the 0.1 m/s speed histogram. Returns a dict with "shape",
+    "scale" and "loc" (always 0), the starting values "moments" and "least_squares",
+    "loglik", "converged", the share of samples in the first (calm) bin "calm_share" and the
+    goodness of fit. If the samples are given, the exact fit is added as "exact" with the
+    relative deviations of the binned fit from it. Without any counts all values are NaN.
+    '''
+    counts = np.asarray(counts, dtype=np.float64)
+    if not counts.any():
+        return empty_fit()
+    if edges is None:
+        edges = histogram_edges(len(counts))
+    edges = np.asarray(edges, dtype=np.float64)
+    calm, calm_share = edges[1], counts[0] / counts.sum()
+
+    # only the range with samples is needed, the bins outside are merged into the end bins
+    nonzero = np.flatnonzero(counts)
+    first, last = nonzero[0], nonzero[-1]
+    edges = np.concatenate([[0.0], edges[first + 1:last + 1], [np.inf]])
+    counts = counts[first:last + 1]
+
+    moments = weibull_moments(edges, counts)
+    n = counts.sum()
+    result = optimize.minimize(lambda params: -binned_loglik(params, edges, counts) / n, np.log(moments),
+                               method="Nelder-Mead", options={"xatol": 1e-8, "fatol": 1e-10, "maxiter": 2000})
+    shape, scale = np.exp(result.x)
+
+    fit = {
+        "shape": shape,
+        "scale": scale,
+        "loc": 0.0,
+        "n": int(n),
+        "calm_share": calm_share,
+        "moments": moments,
+        "least_squares": weibull_least_squares(edges, counts),
+        "loglik": -result.fun * n,
+        "converged": bool(result.success)
+    }
+    fit.update(goodness_of_fit(edges, counts, shape, scale))
+
+    if samples is not None:
+        exact_shape, exact_scale = exact_fit(samples, (shape, scale), calm)
+        fit["exact"] = {
+            "shape": exact_shape,
+            "scale": exact_scale,
+            "shape_deviation": shape / exact_shape - 1,
+            "scale_deviation": scale / exact_scale - 1
+        }
+    return fit
+
+
+def print_fit(name, fit):
+    '''
+    One line summary of a Weibull fit, with the deviation from the exact fit if checked
+    '''
+    if not fit["n"]:
+        print("\tWeibull " + name + ": no samples within the date window")
+        return
+    line = ("\tWeibull " + name + ": shape " + "{:.4f}".format(fit["shape"]) +
+            ", scale " + "{:.4f}".format(fit["scale"]) +
+            ", calms " + "{:.2%}".format(fit["calm_share"]) +
+            ", KS " + "{:.4f}".format(fit["ks"]) +
+            ", chi2/dof " + "{:.2f}".format(fit["chi2"] / fit["dof"]))
+    if "exact" in fit:
+        line += (", exact fit deviation " + "{:+.2%}".format(fit["exact"]["shape_deviation"]) +
+                 " (shape) " + "{:+.2%}".format(fit["exact"]["scale_deviation"]) + " (scale)")
+    print(line)
+
+
+def weibull_curve(fit, lower, upper, nr_points=100):
+    '''
+    Table of the fitted density between lower and upper
+    '''
+    x = np.linspace(lower, upper, nr_points)
+    return pd.DataFrame({"WindVelocity": x, "Density": stats.weibull_min.pdf(x, fit["shape"], fit["loc"], fit["scale"])})
+
+
+def distribution_artifacts(cube, start=None, end=None, binwidth=1.0, samples=None):
+    '''
+    Histogram, Weibull fit and its curve of the speeds of a cube within the date window,
+    as dict with "histogram", "fit" and "curve", the tables being empty without samples
+    '''
+    counts = window_histogram(cube, start, end)
+    fit = fit_weibull(counts, samples=samples)
+    nonzero = np.flatnonzero(counts)
+    if len(nonzero):
+        curve = weibull_curve(fit, nonzero[0] * histogram_resolution, nonzero[-1] * histogram_resolution)
+    else:
+        curve = weibull_curve(fit, 0.0, 0.0, nr_points=0)
+    return {
+        "histogram": histogram_frame(*rebin_histogram(counts, binwidth)),
+        "fit": fit,
+        "curve": curve
+    }
+
+
+def fit_table(fits):
+    '''
+    Table of the Weibull fits by name, with their parameters and goodness of fit
+    '''
+    columns = ["shape", "scale", "loc", "n", "calm_share", "ks", "chi2", "dof", "p_value", "converged"]
+    rows = {name: {column: fit[column] for column in columns} for name, fit in fits.items()}
+    for name, fit in fits.items():
+        if "exact" in fit:
+            rows[name].update({"exact_" + key: value for key, value in fit["exact"].items()})
+    df = pd.DataFrame.from_dict(rows, orient="index")
+    df.index.name = "Name"
+    return df
@@ -0,0 +1,176 @@
+'''
+Peaks over threshold analysis of the wind speeds
+
+The samples above a base threshold are declustered into storms: consecutive exceedances
+belong to the same storm unless they are more than separation minutes apart, and only the
+peak of each storm is kept. The storms are found in one pass over the exceedance times, the
+peaks taken with np.fmax.reduceat at the storm starts.
+
+The excesses of the storm peaks over a threshold u follow a generalized Pareto distribution
+(GPD, scipy convention: c > 0 heavy tail, c = 0 exponential) if u is high enough. The
+threshold is chosen from scans over many candidate thresholds, all evaluated from the
+cumulative sums of the sorted peaks:
+    mean residual life      mean excess over u, linear in u above a suitable threshold
+    parameter stability     shape and modified scale (scale - shape * u) of the GPD fitted by
+                            L-moments, constant in u above a suitable threshold
+The lowest threshold whose shape agrees within tolerance with the median shape of all higher
+thresholds is taken, the GPD then fitted by maximum likelihood to the excesses.
+
+With rate storms per year above the threshold, the return level of T years is
+    u + GPD quantile of 1 - 1 / (rate * T)
+'''
+
+import numpy as np
+from scipy import stats
+
+default_separation = 48 * 60        # minutes between two storms
+minutes_per_year = 365.25 * 24 * 60
+
+
+def observed_years(dates, interval=None):
+    '''
+    Years covered by the samples, from their number and the sampling interval in minutes
+    '''
+    minutes = np.asarray(dates).astype("datetime64[m]").astype(np.int64)
+    if interval is None:
+        interval = float(np.median(np.diff(minutes))) if len(minutes) > 1 else 10.0
+    return len(minutes) * interval / minutes_per_year
+
+
+def decluster(dates, values, threshold, separation=default_separation):
+    '''
+    Storms of the samples above threshold, from the dates sorted in ascending order
+
+    Returns a dict with the "peaks" of the storms, their "dates", the "start" and "end" date
+    of each storm and its number of exceedances "size".
+    '''
+    dates = np.asarray(dates).astype("datetime64[m]")
+    values = np.asarray(values, dtype=np.float64)
+    index = np.flatnonzero(values > threshold)
+    minutes = dates[index].astype(np.int64)
+    exceedances = values[index]
+
+    new = np.concatenate([[True], np.diff(minutes) > separation]) if len(index) else np.zeros(0, dtype=bool)
+    starts = np.flatnonzero(new)
+    ends = np.append(starts[1:], len(index)) - 1
+    storm = np.cumsum(new) - 1
+    peaks = np.fmax.reduceat(exceedances, starts) if len(starts) else np.zeros(0)
+
+    # the first sample of each storm reaching its peak
+    at_peak = np.flatnonzero(exceedances == peaks[storm])
+    at_peak = at_peak[np.concatenate([[True], np.diff(storm[at_peak]) > 0])] if len(at_peak) else at_peak
+
+    return {
+        "peaks": peaks,
+        "dates": dates[index[at_peak]],
+        "start": dates[index[starts]],
+        "end": dates[index[ends]],
+        "size": ends - starts + 1
+    }
+
+
+def candidate_thresholds(peaks, nr_thresholds=50, min_exceedances=30):
+    '''
+    Equally spaced thresholds from the lowest peak up to the one leaving min_exceedances peaks
+    '''
+    peaks = np.sort(peaks)
+    top = peaks[max(len(peaks) - min_exceedances - 1, 0)]
+    return np.linspace(peaks[0], top, nr_thresholds)
+
+
+def threshold_scan(peaks, thresholds):
+    '''
+    Mean residual life and GPD parameter stability for each of the thresholds
+
+    The sums over the peaks above each threshold are suffix sums of the sorted peaks. Returns
+    a dict of arrays: "thresholds", "exceedances", "mean_excess" with its standard error
+    "mean_excess_se", the L-moment "shape", "scale" and the "modified_scale".
+    '''
+    x = np.sort(np.asarray(peaks, dtype=np.float64))
+    n = len(x)
+    u = np.asarray(thresholds, dtype=np.float64)
+    suffix = lambda a: np.concatenate([np.cumsum(a[::-1])[::-1], [0.0]])
+    s1, s2, t1 = suffix(x), suffix(x ** 2), suffix(np.arange(n) * x)
+
+    first = np.searchsorted(x, u, side="right")
+    k = (n - first).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # excesses y = x - u of the k peaks above u
+        l1 = s1[first] / k - u
+        variance = (s2[first] - 2 * u * s1[first] + k * u ** 2) / k - l1 ** 2
+        mean_excess_se = np.sqrt(variance * k / (k - 1) / k)
+        # second L-moment from sum(j * y_j) over the ascending excesses, j = 0 .. k - 1
+        weighted = t1[first] - first * s1[first] - u * k * (k - 1) / 2
+        l2 = 2 * weighted / (k * (k - 1)) - l1
+        shape = 2 - l1 / l2
+        scale = l1 * (1 - shape)
+
+    return {
+        "thresholds": u,
+        "exceedances": k.astype(np.int64),
+        "mean_excess": l1,
+        "mean_excess_se": mean_excess_se,
+        "shape": shape,
+        "scale": scale,
+        "modified_scale": scale - shape * u
+    }
+
+
+def choose_threshold(scan, min_exceedances=30, tolerance=0.1):
+    '''
+    Lowest threshold whose shape is within tolerance of the median shape of all higher ones
+    '''
+    valid = (scan["exceedances"] >= min_exceedances) & np.isfinite(scan["shape"])
+    thresholds, shape = scan["thresholds"][valid], scan["shape"][valid]
+    if not len(thresholds):
+        raise ValueError("Less than " + str(min_exceedances) + " exceedances for all thresholds")
+    higher = np.where(np.triu(np.ones((len(shape), len(shape)), dtype=bool)), shape[None, :], np.nan)
+    stable = np.abs(shape - np.nanmedian(higher, axis=1)) <= tolerance
+    return float(thresholds[np.argmax(stable)] if stable.any() else thresholds[-1])
+
+
+def fit_gpd(peaks, threshold, years):
+    '''
+    Maximum likelihood GPD fit of the excesses of the peaks over threshold, as dict with
+    "distribution", "params" (c, 0, scale), "threshold", the "rate" per year and "n"
+    '''
+    excesses = np.asarray(peaks, dtype=np.float64)
+    excesses = excesses[excesses > threshold] - threshold
+    c, loc, scale = stats.genpareto.fit(excesses, floc=0)
+    return {"distribution": "genpareto", "params": [float(c), float(loc), float(scale)],
+            "threshold": float(threshold), "rate": len(excesses) / years, "n": len(excesses)}
+
+
+def pot_return_levels(fit, periods):
+    '''
+    Values exceeded on average once in the given return periods in years, NaN for periods
+    shorter than the mean time between the storms
+    '''
+    periods = np.asarray(periods, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q = 1 - 1 / (fit["rate"] * periods)
+    return fit["threshold"] + stats.genpareto.ppf(np.where(q > 0, q, np.nan), *fit["params"])
+
+
+def pot_threshold(dates, values, base_quantile=0.99, separation=default_separation, nr_thresholds=50,
+                  min_exceedances=30, tolerance=0.1, threshold=None):
+    '''
+    Declustering above the base_quantile of the values, threshold scans and the chosen
+    threshold (unless given), as dict with "storms", "scan", "threshold" and the observed "years"
+    '''
+    base = float(np.quantile(values, base_quantile))
+    storms = decluster(dates, values, base, separation)
+    scan = threshold_scan(storms["peaks"], candidate_thresholds(storms["peaks"], nr_thresholds, min_exceedances))
+    if threshold is None:
+        threshold = choose_threshold(scan, min_exceedances, tolerance)
+    return {"storms": storms, "scan": scan, "threshold": threshold, "years": observed_years(dates)}
+
+
+def pot_analysis(dates, values, base_quantile=0.99, separation=default_separation, nr_thresholds=50,
+                 min_exceedances=30, tolerance=0.1, threshold=None):
+    '''
+    pot_threshold and the GPD fit, as dict with "storms", "scan", "threshold", "years", "fit"
+    '''
+    pot = pot_threshold(dates, values, base_quantile, separation, nr_thresholds, min_exceedances, tolerance, threshold)
+    pot["fit"] = fit_gpd(pot["storms"]["peaks"], pot["threshold"], pot["years"])
+    return pot
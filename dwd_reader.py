@@ -0,0 +1,228 @@
+'''
+Reading of the DWD product files
+
+The product files are read directly from the downloaded zip archives, without extracting
+them to disk first. Each archive contains one "produkt_*.txt" member with the data and
+several "Metadaten_*" members, which are skipped.
+
+Only the date, wind speed and wind direction columns are parsed, into fixed dtypes.
+The header names are padded with whitespace in some products (e.g. "   F"), they are
+stripped before selecting the columns. MESS_DATUM is given as integer YYYYMMDDHH (hourly)
+or YYYYMMDDHHMM (10-minutes) and is decoded to timestamps arithmetically.
+
+The files are independent of each other and can be read in parallel worker processes.
+For a bounded memory use they can also be read in chunks of a fixed number of rows.
+'''
+
+import itertools
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+product_prefix = "produkt_"
+
+# per product: the columns to keep with their descriptive names
+product_columns = {
+    "hourly_mean": {"MESS_DATUM": "Date", "F": "WindVelocity", "D": "WindDirection"},
+    "10-minutes_mean": {"MESS_DATUM": "Date", "FF_10": "WindVelocity", "DD_10": "WindDirection"},
+    "10-minutes_max": {"MESS_DATUM": "Date", "FX_10": "WindVelocity", "DX_10": "WindDirection"}
+}
+
+column_dtypes = {
+    "Date": "int64",
+    "WindVelocity": "float32",
+    "WindDirection": "int16"
+}
+
+
+def product_member(z):
+    '''
+    Name of the product member of the open zip archive z
+    '''
+    members = [name for name in z.namelist() if name.startswith(product_prefix)]
+    if len(members) != 1:
+        raise ValueError("Expected one product member in " + str(z.filename) + ", found: " + str(members))
+    return members[0]
+
+
+def read_product_csv(archive_path, **kwargs):
+    '''
+    Read the product member of the archive with pd.read_csv, streaming it out of the archive
+    '''
+    with zipfile.ZipFile(archive_path) as z:
+        with z.open(product_member(z)) as f:
+            return pd.read_csv(f, **kwargs)
+
+
+def decode_mess_datum(mess_datum):
+    '''
+    Timestamps from the integer MESS_DATUM, YYYYMMDDHH or YYYYMMDDHHMM
+    '''
+    mess_datum = np.asarray(mess_datum, dtype="int64")
+    if len(mess_datum) > 0 and mess_datum[0] < 10**10:
+        # hourly, no minutes given
+        mess_datum = mess_datum * 100
+
+    year = mess_datum // 10**8
+    month = mess_datum // 10**6 % 100
+    day = mess_datum // 10**4 % 100
+    hour = mess_datum // 100 % 100
+    minute = mess_datum % 100
+
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    days = months.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    return days.astype("datetime64[m]") + (hour * 60 + minute).astype("timedelta64[m]")
+
+
+def product_reader(f, product, **kwargs):
+    '''
+    pd.read_csv of the open product member f, parsing only the columns of product
+    '''
+    columns = product_columns[product]
+    header = [name.strip() for name in f.readline().decode("latin-1").split(";")]
+    usecols = [header.index(column) for column in columns]
+    dtypes = {header.index(column): column_dtypes[name] for column, name in columns.items()}
+    names = {header.index(column): name for column, name in columns.items()}
+    return pd.read_csv(f, sep=";", header=None, usecols=usecols, dtype=dtypes, engine="c", **kwargs), names
+
+
+def product_frame(df, product, names):
+    '''
+    Rename the parsed columns and decode the dates
+    '''
+    df.columns = [names[idx] for idx in df.columns]
+    df["Date"] = decode_mess_datum(df["Date"].to_numpy()).astype("datetime64[ns]")
+    return df[list(product_columns[product].values())]
+
+
+def read_product(archive_path, product):
+    '''
+    Date, WindVelocity and WindDirection of the product file in the archive
+    '''
+    with zipfile.ZipFile(archive_path) as z:
+        with z.open(product_member(z)) as f:
+            df, names = product_reader(f, product)
+    return product_frame(df, product, names)
+
+
+def read_product_chunks(archive_path, product, chunk_size):
+    '''
+    Date, WindVelocity and WindDirection of the product file in the archive,
+    as frames of at most chunk_size rows
+    '''
+    with zipfile.ZipFile(archive_path) as z:
+        with z.open(product_member(z)) as f:
+            reader, names = product_reader(f, product, chunksize=chunk_size)
+            with reader:
+                for df in reader:
+                    yield product_frame(df, product, names)
+
+
+def read_products(tasks, max_workers=None):
+    '''
+    Read several product files across a process pool, one file per task
+
+    tasks is a dict of (archive_path, product), the frames are returned with the same keys.
+    '''
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {key: executor.submit(read_product, *task) for key, task in tasks.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+
+def filter_samples(df):
+    '''
+    Samples of the merged frame indexed by Date, only keeping the positive values
+    '''
+    df = df.set_index(['Date'])
+
+    # only take positive value to ba able to postprocess
+    df = df[df.WindVelocity >= 0]
+    df = df[df.WindDirection >= 0]
+    return df
+
+
+def filter_raw(rw_df, product, station_id):
+    '''
+    General formatting and filtering of the raw data of product and station_id
+
+    Shared by stage 2 and the batch runs, such that any station or product specific
+    filtering enabled here applies to both.
+    '''
+    rw_df = filter_samples(rw_df)
+
+    # NOTE: enable this to only have data from automated readings in the city
+    # instead of starting from 1985 have samples from 1997
+    # if product == 'hourly_mean' and station_id == stations["city"]:
+    #     # for the hourly of the station in the city city
+    #     # using only data generated by automated stations
+    #     # requires: from datetime import datetime and from dwd_data_info import stations
+    #     date_lim = datetime(1997, 7, 1)
+    #     rw_df = rw_df[rw_df.index > date_lim]
+
+    return rw_df
+
+
+def newer_rows(df, last=None):
+    '''
+    Rows of df whose Date is later than last and than all rows before them, with the
+    latest Date given so far
+
+    This is the rule of merge_products and merge_product_chunks: the files are taken in
+    the order of their first Date and a row is only kept if it continues the series, so a
+    Date given in several files is kept from the file starting first, and rows out of date
+    order are dropped.
+    '''
+    dates = df["Date"].to_numpy()
+    if not len(dates):
+        return df, last
+    running = np.maximum.accumulate(dates)
+    keep = np.empty(len(dates), dtype=bool)
+    keep[0] = last is None or dates[0] > last
+    keep[1:] = dates[1:] > running[:-1]
+    if last is not None:
+        keep &= dates > last
+        running[-1] = max(running[-1], last)
+    return (df if keep.all() else df[keep]), running[-1]
+
+
+def merge_products(frames):
+    '''
+    Concatenate the frames of one station and product in date order
+
+    The recent and now files overlap each other and the historical files. The frames are
+    ordered by their first Date and only the rows continuing the series are kept (newer_rows),
+    such that a Date given in several files is kept from the file starting first.
+    '''
+    frames = sorted((df for df in frames if len(df) > 0), key=lambda df: df["Date"].iloc[0])
+    if not frames:
+        return pd.DataFrame({"Date": pd.Series(dtype="datetime64[ns]"),
+                             "WindVelocity": pd.Series(dtype=column_dtypes["WindVelocity"]),
+                             "WindDirection": pd.Series(dtype=column_dtypes["WindDirection"])})
+    df = pd.concat(frames, ignore_index=True)
+    return newer_rows(df)[0].reset_index(drop=True)
+
+
+def merge_product_chunks(readers):
+    '''
+    Chunks of the files of one station and product in date order, from one reader per file
+
+    The same rows as merge_products, but only holding one chunk per file: the files are
+    ordered by their first Date, and newer_rows is applied chunk by chunk with the latest
+    Date given so far.
+    '''
+    heads = []
+    for reader in readers:
+        for df in reader:
+            if len(df) > 0:
+                heads.append((df, reader))
+                break
+    heads.sort(key=lambda head: head[0]["Date"].iloc[0])
+
+    last = None
+    for head, reader in heads:
+        for df in itertools.chain([head], reader):
+            df, last = newer_rows(df, last)
+            if len(df) > 0:
+                yield df
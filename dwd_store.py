@@ -0,0 +1,297 @@
+'''
+Columnar store for the filtered time series, used as interchange format between the stages
+
+Each (station, product) series is stored as compressed Parquet files, partitioned by year:
+    <store_folder>/<station_id>/<product>/<year>.parquet
+with the columns Date, WindVelocity and WindDirection in their typed form. Reading only
+opens the year files overlapping the requested date window, and only the requested columns.
+Within a file the row groups outside of the window are skipped based on their statistics.
+
+For the hot analysis path each series is also stored as raw arrays in one binary file:
+    <store_folder>/<station_id>/<product>.bin
+    header (64 bytes): magic, version, number of samples n, first and last epoch-minute
+    int64[n]    Date as minutes since 1970-01-01
+    float32[n]  WindVelocity
+    uint16[n]   WindDirection
+The file is opened with np.memmap, so decades of 10-minutes data are available instantly
+without parsing and without private copies, and several processes share the same pages.
+
+New data, e.g. from the daily updated recent archives, is appended: only the rows newer than
+the last stored Date are kept, and only the year files they fall into are rewritten.
+'''
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+store_ext = ".parquet"
+row_group_size = 8640       # 2 months of 10-minutes data
+
+series_ext = ".bin"
+series_magic = b"DWDSERIE"
+series_version = 1
+series_header = np.dtype([("magic", "S8"), ("version", "<u4"), ("reserved", "<u4"),
+                          ("n", "<i8"), ("first", "<i8"), ("last", "<i8"), ("padding", "S24")])
+
+
+def series_folder(store_folder, station_id, product):
+    return os.path.join(store_folder, station_id, product)
+
+
+def store_years(store_folder, station_id, product):
+    '''
+    Years available in the store for station_id and product
+    '''
+    folder = series_folder(store_folder, station_id, product)
+    if not os.path.exists(folder):
+        return []
+    return sorted(int(name[:-len(store_ext)]) for name in os.listdir(folder) if name.endswith(store_ext))
+
+
+def write_year(df, store_folder, station_id, product, year):
+    '''
+    Write the rows of one year, df indexed by Date
+    '''
+    folder = series_folder(store_folder, station_id, product)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    path = os.path.join(folder, str(year) + store_ext)
+    df.to_parquet(path + ".part", engine="pyarrow", compression="zstd", row_group_size=row_group_size)
+    os.replace(path + ".part", path)
+
+
+def write_store(df, store_folder, station_id, product):
+    '''
+    Write the series df, indexed by Date, replacing the series in the store
+    '''
+    folder = series_folder(store_folder, station_id, product)
+    years = df.index.year
+    for year in store_years(store_folder, station_id, product):
+        if year not in years:
+            os.remove(os.path.join(folder, str(year) + store_ext))
+    for year, df_year in df.groupby(years):
+        write_year(df_year, store_folder, station_id, product, year)
+
+
+def store_last(store_folder, station_id, product):
+    '''
+    Last Date in the store for station_id and product, None if there is none
+    '''
+    years = store_years(store_folder, station_id, product)
+    if not years:
+        return None
+    path = os.path.join(series_folder(store_folder, station_id, product), str(years[-1]) + store_ext)
+    index = pd.read_parquet(path, engine="pyarrow", columns=[]).index
+    return index.max() if len(index) else None
+
+
+def append_store(df, store_folder, station_id, product):
+    '''
+    Append the rows of df, indexed by Date, which are newer than the last Date in the store,
+    rewriting only the year files they fall into, and return the rows appended
+    '''
+    last = store_last(store_folder, station_id, product)
+    df = df.sort_index(kind="stable")
+    df = df[~df.index.duplicated(keep="first")]
+    if last is not None:
+        df = df[df.index > last]
+
+    folder = series_folder(store_folder, station_id, product)
+    for year, df_year in df.groupby(df.index.year):
+        path = os.path.join(folder, str(year) + store_ext)
+        if os.path.exists(path):
+            df_year = pd.concat([pd.read_parquet(path, engine="pyarrow"), df_year])
+        write_year(df_year, store_folder, station_id, product, year)
+    return df
+
+
+def read_store(store_folder, station_id, product, columns=None, start=None, end=None):
+    '''
+    Series of station_id and product indexed by Date, optionally only the given columns
+    and only the rows with start <= Date < end
+    '''
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    filters = []
+    if start is not None:
+        filters.append(("Date", ">=", start))
+    if end is not None:
+        filters.append(("Date", "<", end))
+
+    folder = series_folder(store_folder, station_id, product)
+    frames = []
+    for year in store_years(store_folder, station_id, product):
+        if start is not None and year < start.year:
+            continue
+        if end is not None and pd.Timestamp(year, 1, 1) >= end:
+            continue
+        frames.append(pd.read_parquet(os.path.join(folder, str(year) + store_ext), engine="pyarrow",
+                                      columns=columns, filters=filters if filters else None))
+    if not frames:
+        raise FileNotFoundError("No data in the store for " + station_id + " " + product)
+    return pd.concat(frames)
+
+
+def series_path(store_folder, station_id, product):
+    return os.path.join(store_folder, station_id, product + series_ext)
+
+
+def header_bytes(n, first, last):
+    '''
+    Header of a binary series file with n samples from first to last epoch-minute
+    '''
+    header = np.zeros(1, dtype=series_header)
+    header["magic"] = series_magic
+    header["version"] = series_version
+    header["n"] = n
+    header["first"] = first
+    header["last"] = last
+    return header.tobytes()
+
+
+def write_series(df, store_folder, station_id, product):
+    '''
+    Write the series df, indexed by Date, as binary file for np.memmap
+    '''
+    minutes = df.index.values.astype("datetime64[m]").astype("int64")
+    n = len(minutes)
+
+    path = series_path(store_folder, station_id, product)
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path + ".part", "wb") as f:
+        f.write(header_bytes(n, minutes[0] if n > 0 else 0, minutes[-1] if n > 0 else 0))
+        f.write(np.ascontiguousarray(minutes, dtype="<i8").tobytes())
+        f.write(np.ascontiguousarray(df["WindVelocity"].values, dtype="<f4").tobytes())
+        f.write(np.ascontiguousarray(df["WindDirection"].values, dtype="<u2").tobytes())
+    os.replace(path + ".part", path)
+
+
+def append_series(df, store_folder, station_id, product):
+    '''
+    Append the series df, indexed by Date and newer than the last Date of the binary file
+    '''
+    path = series_path(store_folder, station_id, product)
+    if not os.path.exists(path):
+        write_series(df, store_folder, station_id, product)
+        return
+
+    series = open_series(store_folder, station_id, product)
+    minutes = df.index.values.astype("datetime64[m]").astype("int64")
+    if len(minutes) == 0:
+        return
+    if len(series["minutes"]) and minutes[0] <= series["minutes"][-1]:
+        raise ValueError("Appended dates have to be newer than the last one in " + path)
+    n = len(series["minutes"]) + len(minutes)
+    first = series["minutes"][0] if len(series["minutes"]) else minutes[0]
+
+    # the arrays are stored one after the other, so the file is written anew
+    with open(path + ".part", "wb") as f:
+        f.write(header_bytes(n, first, minutes[-1]))
+        f.write(np.ascontiguousarray(series["minutes"]).tobytes())
+        f.write(np.ascontiguousarray(minutes, dtype="<i8").tobytes())
+        f.write(np.ascontiguousarray(series["speed"]).tobytes())
+        f.write(np.ascontiguousarray(df["WindVelocity"].values, dtype="<f4").tobytes())
+        f.write(np.ascontiguousarray(series["direction"]).tobytes())
+        f.write(np.ascontiguousarray(df["WindDirection"].values, dtype="<u2").tobytes())
+    del series
+    os.replace(path + ".part", path)
+
+
+def write_chunks(chunks, store_folder, station_id, product):
+    '''
+    Write the series given as frames indexed by Date in ascending order, replacing both the
+    Parquet files and the binary file of the series
+
+    Only the rows of the current year are held in memory until its file is written, the
+    arrays of the binary file are streamed to one temporary file each and joined at the end.
+    '''
+    folder = series_folder(store_folder, station_id, product)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    path = series_path(store_folder, station_id, product)
+    parts = [path + "." + key + ".part" for key in ["minutes", "speed", "direction"]]
+
+    n = 0
+    first = last = 0
+    years = []
+    buffer = []
+    files = [open(part, "wb") for part in parts]
+    try:
+        for df in chunks:
+            if len(df) == 0:
+                continue
+            minutes = df.index.values.astype("datetime64[m]").astype("int64")
+            files[0].write(np.ascontiguousarray(minutes, dtype="<i8").tobytes())
+            files[1].write(np.ascontiguousarray(df["WindVelocity"].values, dtype="<f4").tobytes())
+            files[2].write(np.ascontiguousarray(df["WindDirection"].values, dtype="<u2").tobytes())
+            if n == 0:
+                first = minutes[0]
+            n += len(minutes)
+            last = minutes[-1]
+
+            for year, df_year in df.groupby(df.index.year):
+                if years and year != years[-1]:
+                    write_year(pd.concat(buffer), store_folder, station_id, product, years[-1])
+                    buffer = []
+                if not years or year != years[-1]:
+                    years.append(year)
+                buffer.append(df_year)
+        if buffer:
+            write_year(pd.concat(buffer), store_folder, station_id, product, years[-1])
+    finally:
+        for f in files:
+            f.close()
+
+    with open(path + ".part", "wb") as f:
+        f.write(header_bytes(n, first, last))
+        for part in parts:
+            with open(part, "rb") as f_part:
+                shutil.copyfileobj(f_part, f)
+    os.replace(path + ".part", path)
+    for part in parts:
+        os.remove(part)
+
+    for year in store_years(store_folder, station_id, product):
+        if year not in years:
+            os.remove(os.path.join(folder, str(year) + store_ext))
+
+
+def open_series(store_folder, station_id, product):
+    '''
+    Memory-mapped arrays of the series, as dict with "minutes" (int64 epoch-minutes),
+    "dates" (the same memory viewed as datetime64[m]), "speed" and "direction"
+    '''
+    path = series_path(store_folder, station_id, product)
+    header = np.fromfile(path, dtype=series_header, count=1)[0]
+    if header["magic"] != series_magic or header["version"] != series_version:
+        raise ValueError("Not a series file of version " + str(series_version) + ": " + path)
+
+    n = int(header["n"])
+    offset = series_header.itemsize
+    minutes = np.memmap(path, dtype="<i8", mode="r", offset=offset, shape=(n,)) if n else np.zeros(0, "<i8")
+    offset += 8 * n
+    speed = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(n,)) if n else np.zeros(0, "<f4")
+    offset += 4 * n
+    direction = np.memmap(path, dtype="<u2", mode="r", offset=offset, shape=(n,)) if n else np.zeros(0, "<u2")
+
+    return {
+        "minutes": minutes,
+        "dates": minutes.view("datetime64[m]"),
+        "speed": speed,
+        "direction": direction
+    }
+
+
+def series_frame(series, columns=None):
+    '''
+    DataFrame indexed by Date from the arrays of open_series, for the pandas based steps
+    '''
+    data = {"WindVelocity": series["speed"], "WindDirection": series["direction"]}
+    if columns is not None:
+        data = {column: data[column] for column in columns}
+    return pd.DataFrame(data, index=pd.DatetimeIndex(series["dates"], name="Date"))
@@ -0,0 +1,135 @@
+'''
+Local HTTP stand-in of the DWD open data server for the download tests
+
+The server serves one zip archive under any path, with ETag and Last-Modified, conditional
+requests and Range/If-Range resumption. The responses of the next requests can be scripted
+in "plan", each entry being one of
+    None            the normal response
+    ("drop", n)     the full headers, but the connection is closed after n bytes of the body
+    ("status", c)   an empty response with the status code c, e.g. 503 or 416
+    ("short", n)    a complete response of only n bytes of the body, the Content-Range still
+                    giving the full size of the archive
+    ("shift", n)    a partial response starting n bytes after the requested Range
+The path "/loop" redirects to itself. Every request is recorded in "requests" with its
+path, headers and the number of body bytes sent.
+'''
+
+import io
+import os
+import sys
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_archive(size=300000, seed=0):
+    '''
+    Zip archive of one uncompressed member of random bytes
+    '''
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as z:
+        z.writestr("produkt_zehn_min_ff_test.txt", np.random.default_rng(seed).bytes(size))
+    return buffer.getvalue()
+
+
+def corrupt(data):
+    '''
+    The archive with one byte of the member data flipped, failing its CRC-32 check
+    '''
+    data = bytearray(data)
+    data[len(data) // 2] ^= 0xFF
+    return bytes(data)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        state = self.server.state
+        record = {"path": self.path, "headers": dict(self.headers), "sent": 0, "status": None}
+        state["requests"].append(record)
+        action = state["plan"].pop(0) if state["plan"] else None
+
+        if self.path == "/loop":
+            record["status"] = 302
+            self.send_response(302)
+            self.send_header("Location", "/loop")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if action is not None and action[0] == "status":
+            record["status"] = action[1]
+            self.send_response(action[1])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        data = state["data"]
+        if self.headers.get("If-None-Match") == state["etag"]:
+            record["status"] = 304
+            self.send_response(304)
+            self.send_header("ETag", state["etag"])
+            self.end_headers()
+            return
+
+        start = 0
+        status = 200
+        requested = self.headers.get("Range")
+        if requested and self.headers.get("If-Range") in [None, state["etag"], state["last_modified"]]:
+            start = int(requested.split("=")[1].split("-")[0])
+            if start >= len(data):
+                record["status"] = 416
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */" + str(len(data)))
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+            if action is not None and action[0] == "shift":
+                start += action[1]
+
+        body = data[start:]
+        if action is not None and action[0] == "short":
+            body = body[:action[1]]
+        record["status"] = status
+        self.send_response(status)
+        self.send_header("ETag", state["etag"])
+        self.send_header("Last-Modified", state["last_modified"])
+        self.send_header("Content-Length", str(len(body)))
+        if status == 206:
+            self.send_header("Content-Range", "bytes " + str(start) + "-" + str(len(data) - 1) + "/" + str(len(data)))
+        self.end_headers()
+
+        if action is not None and action[0] == "drop":
+            body = body[:action[1]]
+            self.close_connection = True
+        self.wfile.write(body)
+        self.wfile.flush()
+        record["sent"] = len(body)
+
+
+@pytest.fixture
+def stand_in():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    server.state = {
+        "data": make_archive(),
+        "etag": '"v1"',
+        "last_modified": "Mon, 02 Jan 2023 00:00:00 GMT",
+        "plan": [],
+        "requests": []
+    }
+    server.url = lambda name: "http://127.0.0.1:" + str(server.server_address[1]) + "/" + name
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from conftest import corrupt
+from dwd_download import archive_path, download, download_all, load_manifest, make_session, manifest_name
+
+
+def test_download_and_conditional_request(stand_in, tmp_path):
+    info = {"archive": {"url": stand_in.url("archive.zip")}}
+    results, _ = download_all(info, str(tmp_path), max_workers=1, backoff_factor=0)
+    assert results["archive"]["status"] == "downloaded"
+
+    path = archive_path(str(tmp_path), info["archive"]["url"])
+    with open(path, "rb") as f:
+        assert f.read() == stand_in.state["data"]
+    entry = load_manifest(str(tmp_path))["archive"]
+    assert entry["size"] == len(stand_in.state["data"])
+    assert entry["sha256"] == hashlib.sha256(stand_in.state["data"]).hexdigest()
+
+    # unchanged on the server: only a conditional request, no body
+    results, _ = download_all(info, str(tmp_path), max_workers=1, backoff_factor=0)
+    assert results["archive"]["status"] == "unchanged"
+    assert stand_in.state["requests"][-1]["headers"]["If-None-Match"] == '"v1"'
+    assert stand_in.state["requests"][-1]["sent"] == 0
+
+
+def test_dropped_connection_is_resumed(stand_in, tmp_path):
+    data = stand_in.state["data"]
+    stand_in.state["plan"] = [("drop", 100000)]
+    target = str(tmp_path / "archive.zip")
+    result = download(make_session(), stand_in.url("archive.zip"), target, chunk_size=1024, backoff_factor=0)
+
+    assert result["status"] == "downloaded"
+    first, second = stand_in.state["requests"]
+    assert first["sent"] == 100000
+    # the second request continues at the bytes already received instead of restarting
+    offset = int(second["headers"]["Range"].split("=")[1].rstrip("-"))
+    assert 0 < offset <= 100000
+    assert second["headers"]["If-Range"] == '"v1"'
+    assert second["status"] == 206
+    assert second["sent"] == len(data) - offset
+    with open(target, "rb") as f:
+        assert f.read() == data
+    assert not os.path.exists(target + ".part")
+
+
+def test_incomplete_partial_response_is_resumed(stand_in, tmp_path):
+    data = stand_in.state["data"]
+    stand_in.state["plan"] = [("drop", 100000), ("short", 50000)]
+    target = str(tmp_path / "archive.zip")
+    result = download(make_session(), stand_in.url("archive.zip"), target, chunk_size=1024, backoff_factor=0)
+
+    assert result["status"] == "downloaded"
+    first, second, third = stand_in.state["requests"]
+    # the short 206 response is kept and continued by the next attempt
+    offset = int(second["headers"]["Range"].split("=")[1].rstrip("-"))
+    assert second["sent"] == 50000
+    assert third["headers"]["Range"] == "bytes=" + str(offset + 50000) + "-"
+    with open(target, "rb") as f:
+        assert f.read() == data
+
+
+def test_unexpected_content_range_is_rejected(stand_in, tmp_path):
+    data = stand_in.state["data"]
+    stand_in.state["plan"] = [("drop", 100000), ("shift", 10)]
+    target = str(tmp_path / "archive.zip")
+    result = download(make_session(), stand_in.url("archive.zip"), target, chunk_size=1024, backoff_factor=0)
+
+    # the misplaced body is not appended, the next attempt requests the same range again
+    assert result["status"] == "downloaded"
+    first, second, third = stand_in.state["requests"]
+    assert second["headers"]["Range"] == third["headers"]["Range"]
+    with open(target, "rb") as f:
+        assert f.read() == data
+
+
+@pytest.mark.parametrize("status_code", [429, 503])
+def test_server_errors_are_retried(stand_in, tmp_path, status_code):
+    stand_in.state["plan"] = [("status", status_code), ("status", status_code)]
+    info = {"archive": {"url": stand_in.url("archive.zip")}}
+    results, _ = download_all(info, str(tmp_path), max_workers=1, backoff_factor=0)
+    assert results["archive"]["status"] == "downloaded"
+    assert [request["status"] for request in stand_in.state["requests"]] == [status_code, status_code, 200]
+
+
+def test_range_not_satisfiable_restarts(stand_in, tmp_path):
+    target = str(tmp_path / "archive.zip")
+    # a stale partial file of the same archive, longer than the archive on the server
+    with open(target + ".part", "wb") as f:
+        f.write(b"x" * (len(stand_in.state["data"]) + 10))
+    with open(target + ".part.json", "w") as f:
+        json.dump({"etag": '"v1"', "last_modified": None}, f)
+
+    result = download(make_session(), stand_in.url("archive.zip"), target, backoff_factor=0)
+    assert result["status"] == "downloaded"
+    first, second = stand_in.state["requests"]
+    assert first["status"] == 416
+    assert "Range" not in second["headers"]
+    with open(target, "rb") as f:
+        assert f.read() == stand_in.state["data"]
+
+
+def test_corrupt_archive_is_not_recorded(stand_in, tmp_path):
+    good = stand_in.state["data"]
+    stand_in.state["data"] = corrupt(good)
+    info = {"archive": {"url": stand_in.url("archive.zip")}}
+    results, _ = download_all(info, str(tmp_path), max_workers=1, max_retries=2, backoff_factor=0)
+
+    # every attempt fails the CRC check: no archive and no manifest entry
+    assert results["archive"]["status"] == "error"
+    assert len(stand_in.state["requests"]) == 3
+    assert not os.path.exists(archive_path(str(tmp_path), info["archive"]["url"]))
+    assert "archive" not in load_manifest(str(tmp_path))
+
+    # the entry is only written once an archive passes the check
+    stand_in.state["data"] = good
+    results, _ = download_all(info, str(tmp_path), max_workers=1, backoff_factor=0)
+    assert results["archive"]["status"] == "downloaded"
+    assert load_manifest(str(tmp_path))["archive"]["sha256"] == hashlib.sha256(good).hexdigest()
+
+
+def test_request_exception_fails_only_its_archive(stand_in, tmp_path):
+    info = {
+        "archive": {"url": stand_in.url("archive.zip")},
+        "loop": {"url": stand_in.url("loop")}
+    }
+    results, _ = download_all(info, str(tmp_path), max_workers=2, backoff_factor=0)
+
+    assert results["archive"]["status"] == "downloaded"
+    assert results["loop"]["status"] == "error"
+    assert results["loop"]["error"].startswith("TooManyRedirects")
+    # not retried: one chain of redirects only
+    assert sum(request["path"] == "/loop" for request in stand_in.state["requests"]) == 31
+    with open(os.path.join(str(tmp_path), manifest_name)) as f:
+        assert list(json.load(f)) == ["archive"]